@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+"""
+调用IntaRNA程序，完成tRFs至mRNAs的绑定位置预测，结果保存为intarna_results.csv，再由parseIntaRNA.py解析
+使用-c选项时，每个tRF的结果保存在缓存中，之后的运行只对缓存中没有的tRFs调用IntaRNA
+使用-P选项时，用cProfile分析运行耗时
+"""
+
+
+import sys, os
+from getopt import getopt
+from time import time
+from trftarget.intarna import inta_run
+from trftarget.profiling import profileStage
+
+
+#############主函数#####################################################################
+def usage():
+    '''对主函数进行简介
+    '''
+    print('''
+python callIntaRNA.py [option][value]...
+    -h or --help        print this help messages
+    -t or --target      mRNA fasta file for input，with absolute or relative path
+    -q or --query       tRFs fasta file for input, with absolute or relative path
+    -o or --outputpath  absolute or relative path for result files. If ignored, the current path will be used
+    -n or --n_cores     number of threads used by IntaRNA. Default value is 1
+    -e or --MFE         free energy threshold, used for IntaRNA `--outMaxE` option. Default value is 0
+    -s or --seed_len    threshold of the number of base pairs within the seed, used for IntaRNA `--seedBP` option. Default value is 6
+    -b or --suboptimal  reported number of interaction sites on each transcript, used for IntaRNA `-n` option. Default value is 1
+    -c or --cache_dir   directory of the result cache shared across runs. Results of tRFs with the same sequence, target file, IntaRNA version and options are read from it instead of running IntaRNA again. Default is no cache
+    -z or --cache_size  size limit of the result cache in GB, least recently used results are removed beyond it. Default value is 10
+    -P or --profile     profile the run with cProfile, including the worker processes. Profiles of each process are saved in the folder profiles under the output path, and merged into a summary of the hot functions (intarna_profile.txt)
+''')
+
+# 如果没有任何参数，显示提示信息，并退出
+if len(sys.argv) == 1:
+    print('-h or --help for detail')
+    sys.exit(1)
+
+
+# 定义命令行参数
+# 短选项名后的冒号(:)表示该选项必须有附加的参数
+# 长选项名后的等号(=)表示该选项必须有附加的参数。
+shortargs = 'ht:q:o:n:e:s:b:c:z:P'
+longargs = ['help', 'target=', 'query=', 'outputpath=', 'n_cores=', 'MFE=', 'seed_len=', 'suboptimal=', 'cache_dir=', 'cache_size=', 'profile']
+
+# 解析命令行参数
+# sys.argv[0]为python脚本名，后续全为参数
+# opts为分析出的参数信息，args为不符合格式信息的剩余参数
+opts, args = getopt(sys.argv[1:], shortargs, longargs)
+
+
+# 如果存在不符合格式信息的剩余参数，显示提示信息，并退出
+if args:
+    print('Invalid options exist!')
+    print('-h or --help for detail')
+    sys.exit(1)
+
+
+# 定义dict类型的参数集，使得算法更稳健
+paramdict = {'target_file':None, 'query_file':None, 'output_path':os.getcwd(),
+             'n_cores':1, 'MFE':0, 'seed_len':6, 'suboptimal':1, 'cache_dir':'', 'cache_size':10, 'profile':False}
+
+for opt,val in opts:
+    if opt in ('-h', '--help'):
+        usage()
+        sys.exit(1)
+
+    if opt in ('-t', '--target'):
+        if not os.path.isfile(val):
+            # 输入不是一个确实存在的文件名
+            raise Exception('Invalid input target file!')
+        # 采用realpath函数，获得真实绝对路径
+        paramdict['target_file'] = os.path.realpath(val)
+        continue
+
+    if opt in ('-q', '--query'):
+        if not os.path.isfile(val):
+            # 输入不是一个确实存在的文件名
+            raise Exception('Invalid input query file!')
+        # 采用realpath函数，获得真实绝对路径
+        paramdict['query_file'] = os.path.realpath(val)
+        continue
+
+    if opt in ('-o', '--outputpath'):
+        if not os.path.isdir(val):
+            # 输入不是一个确实存在的文件夹
+            raise Exception('Invalid or not existed directory!')
+        # 采用realpath函数，获得真实绝对路径
+        paramdict['output_path'] = os.path.realpath(val)
+        continue
+
+    if opt in ('-n', '--n_cores'):
+        paramdict['n_cores'] = int(val)
+        continue
+
+    if opt in ('-e', '--MFE'):
+        paramdict['MFE'] = float(val)
+        continue
+
+    if opt in ('-s', '--seed_len'):
+        paramdict['seed_len'] = int(val)
+        continue
+
+    if opt in ('-b', '--suboptimal'):
+        paramdict['suboptimal'] = int(val)
+        continue
+
+    if opt in ('-c', '--cache_dir'):
+        # 缓存文件夹不存在时自动建立
+        paramdict['cache_dir'] = os.path.realpath(val)
+        continue
+
+    if opt in ('-z', '--cache_size'):
+        paramdict['cache_size'] = float(val)
+        continue
+
+    if opt in ('-P', '--profile'):
+        paramdict['profile'] = True
+        continue
+
+# 检查参数是否齐全
+for k,v in paramdict.items():
+    if v is None:
+        raise Exception('Option "{}" is missing!'.format(k))
+
+print('IntaRNA running options:')
+for k,v in paramdict.items():
+    print('{}: {}'.format(k, v))
+
+# 调用分析函数
+start_time = time()
+with profileStage(paramdict['output_path'], 'IntaRNA', paramdict['profile']):
+    inta_run(paramdict['query_file'], paramdict['target_file'], paramdict['output_path'],
+             paramdict['n_cores'], paramdict['seed_len'], paramdict['suboptimal'], paramdict['MFE'],
+             paramdict['cache_dir'] or None, paramdict['cache_size']*2**30)
+print('IntaRNA analysis completed. Elapsed time: {:.2f} hours.'.format((time()-start_time)/3600.0))
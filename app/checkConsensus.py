@@ -11,124 +11,26 @@ Created on Wed Apr 22 23:34:50 2020
 经过考虑，offset bases threshold设为2，即前后可以相差2个bases
 
 Update: add a consensus indicator column in the original RNAhybrid and IntaRNA predictions
+Update: 一致性判断函数移至trftarget.consensus，本脚本仅解析命令行参数
+Update: add -n option to check consensus in parallel
+Update: add -s option to check consensus of sorted files in streaming mode
+Update: save Consensus flags into sidecar files, add -m option to write them into the input CSV files
+Update: accept parquet input files, add -f option to save consensus results in parquet format
+Update: add -P option to profile the run, including the worker processes
+Update: -s option also accepts unsorted files, which are sorted on disk in chunks first
 """
 
 
-import pandas as pd
 from time import time
-from tqdm import tqdm
 import sys, os
-import collections
 from getopt import getopt
+from trftarget.consensus import consensus_analysis
+from trftarget.table import checkFormat
+from trftarget.profiling import profileStage
 
 start_time = time()
 
 
-###############Consensus函数#####################################################
-def checkConsensus(dataframe, offset):
-    '''检查所有记录，返回重复的、一致的entries的index
-    IntaRNA的重复entries已经delete，因此不必考虑重复entries的影响
-    也因此consensus记录必定是一一对应，不会出现一对多现象
-    '''
-    
-    def checkEntries(dataframe, offset):
-        '''检查某个tRF和某个transcript的所有记录，是否属于一致
-        一致的定义为：target起止位置在+/-offset个base之内
-        dataframe只包含1个tRF和1个transcript
-        返回一致entries的index
-        '''
-    
-        def checkSite(start1, start2, end1, end2, offset):
-            '''输入2个interaction site的开始和结束位置
-            判断是否属于一致
-            '''
-        
-            if abs(start1-start2)<=offset and abs(end1-end2)<=offset:
-                return True
-            else:
-                return False
-    
-        if dataframe.shape[0] == 1:
-            return None
-    
-        output = []
-        # 从第2条记录开始
-        for i in range(1, dataframe.shape[0], 1):
-            # 确认与排在它前面的所有记录，是否存在一致
-            for j in range(i):
-                if checkSite(dataframe.at[dataframe.index[j], 'Start_Target'],
-                             dataframe.at[dataframe.index[i], 'Start_Target'],
-                             dataframe.at[dataframe.index[j], 'End_Target'],
-                             dataframe.at[dataframe.index[i], 'End_Target'], offset):
-                    # 配对二者的index都加入list
-                    output.append(dataframe.index[i])
-                    output.append(dataframe.index[j])
-                    # 只要配对上了，该记录就可以保留，无需考虑它最终能配对上多少个
-                    break
-        
-        # 删除output中的重复项，确认其数目是否为偶数
-        # 注意保留原始list，因为set会自动排序
-        # 原始list中是相邻两两配对的，利于网页展示
-        if len(set(output)) % 2 == 1:
-            # 存在一对多情况
-            find_ids = [item for item, count in collections.Counter(output).items() if count > 1]
-            print('########################################')
-            print('Special cases exist for tRF "{}" and transcript "{}"'.format(
-                    dataframe.iloc[0]['tRF_ID'], dataframe.iloc[0]['Transcript_ID']))
-            for idx in find_ids:
-                # 输出特例
-                print(dataframe.at[idx, 'Demo'])
-            print('########################################')
-            
-        return output
-    
-    
-    # 先对dataframe进行排序
-    dataframe.sort_values(['Transcript_ID'], inplace=True)
-    
-    to_del = []
-    
-    this_enst = dataframe.at[dataframe.index[0], 'Transcript_ID']
-    ind_for_check = []
-    
-    # at/loc都是按index索引row，iloc按位置
-    for i in tqdm(dataframe.index):        
-        if dataframe.at[i, 'Transcript_ID'] == this_enst:
-            # 同一个transcript的记录，加入比较
-            ind_for_check.append(i)
-        else:
-            # 新的transcript的开始，之前的可以进行比较了
-            tmp_result = checkEntries(dataframe.loc[ind_for_check], offset)
-            if not tmp_result is None:
-                if len(tmp_result) > 0:
-                    '''
-                    print('Total {:d} dumplicated entries for tRF "{}" and transcript "{}"'
-                          .format(len(tmp_result), dataframe.at[tmp_result[0], 'tRF_ID'], this_enst))
-                    '''
-                    to_del += tmp_result
-                    
-            this_enst = dataframe.at[i, 'Transcript_ID']
-            ind_for_check.clear()
-            ind_for_check.append(i)
-    
-    # 循环结束时，最后一组序列需要检查
-    if len(ind_for_check) > 0:
-        tmp_result = checkEntries(dataframe.loc[ind_for_check], offset)
-        if not tmp_result is None:
-            if len(tmp_result) > 0:
-                '''
-                print('Total {:d} dumplicated entries for tRF "{}" and transcript "{}"'
-                      .format(len(tmp_result), dataframe.at[tmp_result[0], 'tRF_ID'], this_enst))
-                '''
-                to_del += tmp_result
-    
-    # 最后返回to_del索引中的rows
-    
-    # update: also return the index of consensus entries
-    
-    return dataframe.loc[to_del], to_del
-    
-
 ###############主函数#####################################################
 def usage():
     '''对主函数进行简介
@@ -136,9 +38,14 @@ def usage():
     print('''
 python checkConsensus.py [option][value]...
     -h or --help        print this help messages
-    -r or --rnahybrid   CSV files of parsed RNAhybrid results
-    -i or --intarna     CSV files of parsed IntaRNA results
+    -r or --rnahybrid   CSV or parquet files of parsed RNAhybrid results
+    -i or --intarna     CSV or parquet files of parsed IntaRNA results
     -o or --outputpath  absolute or relative path for CSV file of consensus results. If ignored, the current path will be used
+    -f or --format      format of the consensus results, csv or parquet (needs pyarrow). Default value is csv
+    -n or --n_cores     number of CPU cores used for checking tRFs in parallel. Default value is 1
+    -m or --materialize also write the Consensus column into the RNAhybrid and IntaRNA result files. Without it, the flags are only saved as sidecar files (*.consensus.npz) next to the result files
+    -s or --streaming   read both result files in chunks and check them chunk by chunk, so RAM usage does not grow with the number of entries. Files not sorted by tRF_ID and then Transcript_ID (e.g. the RNAhybrid results in query order) are first sorted on disk in chunks. -n is ignored in this mode
+    -P or --profile     profile the run with cProfile, including the worker processes. Profiles of each process are saved in the folder profiles under the output path, and merged into a summary of the hot functions (consensus_profile.txt)
 ''')
 
 # 如果没有任何参数，显示提示信息，并退出
@@ -150,8 +57,8 @@ if len(sys.argv) == 1:
 # 定义命令行参数
 # 短选项名后的冒号(:)表示该选项必须有附加的参数
 # 长选项名后的等号(=)表示该选项必须有附加的参数。
-shortargs = 'hr:i:o:'
-longargs = ['help', 'rnahybrid=', 'intarna=', 'outputpath=']
+shortargs = 'hr:i:o:n:smf:P'
+longargs = ['help', 'rnahybrid=', 'intarna=', 'outputpath=', 'n_cores=', 'streaming', 'materialize', 'format=', 'profile']
 
 # 解析命令行参数
 # sys.argv[0]为python脚本名，后续全为参数
@@ -167,7 +74,7 @@ if args:
 
    
 # 定义dict类型的参数集，使得算法更稳健
-paramdict = {'rnahybrid_file':None, 'intarna_file':None, 'output_path':os.getcwd()}
+paramdict = {'rnahybrid_file':None, 'intarna_file':None, 'output_path':os.getcwd(), 'n_cores':1, 'streaming':False, 'materialize':False, 'format':'csv', 'profile':False}
  
 for opt,val in opts:
     if opt in ('-h', '--help'):
@@ -177,7 +84,7 @@ for opt,val in opts:
     if opt in ('-r', '--rnahybrid'):
         if not os.path.isfile(val):
             # 输入不是一个确实存在的文件名
-            raise Exception('Invalid input RNAhybrid CSV file!')
+            raise Exception('Invalid input RNAhybrid result file!')
         # 采用realpath函数，获得真实绝对路径
         paramdict['rnahybrid_file'] = os.path.realpath(val)
         continue
@@ -185,7 +92,7 @@ for opt,val in opts:
     if opt in ('-i', '--intarna'):
         if not os.path.isfile(val):
             # 输入不是一个确实存在的文件名
-            raise Exception('Invalid input IntaRNA CSV file!')
+            raise Exception('Invalid input IntaRNA result file!')
         # 采用realpath函数，获得真实绝对路径
         paramdict['intarna_file'] = os.path.realpath(val)
         continue
@@ -197,6 +104,27 @@ for opt,val in opts:
         # 采用realpath函数，获得真实绝对路径
         paramdict['output_path'] = os.path.realpath(val)
         continue
+    
+    if opt in ('-n', '--n_cores'):
+        paramdict['n_cores'] = int(val)
+        continue
+    
+    if opt in ('-s', '--streaming'):
+        paramdict['streaming'] = True
+        continue
+    
+    if opt in ('-m', '--materialize'):
+        paramdict['materialize'] = True
+        continue
+    
+    if opt in ('-f', '--format'):
+        checkFormat(val)
+        paramdict['format'] = val
+        continue
+    
+    if opt in ('-P', '--profile'):
+        paramdict['profile'] = True
+        continue
 
 # 检查参数是否齐全
 for k,v in paramdict.items():
@@ -208,83 +136,10 @@ for k,v in paramdict.items():
     print('{}: {}'.format(k, v))
 
 
-# ---------------------Needed Files------------------------------
-output_path = paramdict['output_path']
-rnahybrid_file = paramdict['rnahybrid_file']
-intarna_file = paramdict['intarna_file']
-output_file = os.path.join(output_path, 'consensus_results.csv')
-
-
-# Read all results at once, it will cost huge RAM
-
-# Read RNAhybrid results
-rnahybrid_df = pd.read_csv(rnahybrid_file, dtype={'tRF_ID': str, 'Transcript_ID': str})
-print('Read {:,} RNAhybrid entries'.format(rnahybrid_df.shape[0]))
-# modify index to be different with IntaRNA entries
-rnahybrid_df.set_index('rnahybrid_' + rnahybrid_df.index.astype(str), inplace=True)
-rnahybrid_df['Consensus'] = 0
-
-intarna_df = pd.read_csv(intarna_file, dtype={'tRF_ID': str, 'Transcript_ID': str})
-print('Read {:,} IntaRNA entries'.format(intarna_df.shape[0]))
-# modify index to be different with RNAhybrid entries
-intarna_df.set_index('intarna_' + intarna_df.index.astype(str), inplace=True)
-intarna_df['Consensus'] = 0
-
-# 所有tRFs
-trfs = set(rnahybrid_df.tRF_ID)
-print('total {:d} tRFs'.format(len(trfs)))
-
-
-# 统计结果的list of dicts
-status = []
-
-# 遍历所有tRFs
-for ind, trf in enumerate(trfs):
-    
-    print('Currently checking tRF "{}"'.format(trf))
-    
-    # Check Consensus
-    # the columns of RNAhybrid and IntaRNA are already setted to the same order
-    this_rnahybrid = rnahybrid_df.loc[rnahybrid_df.tRF_ID==trf]
-    this_intarna = intarna_df.loc[intarna_df.tRF_ID==trf]
-    
-    output, this_consensus_index = checkConsensus(pd.concat([this_rnahybrid, this_intarna], ignore_index=False), 2)
-    print('Finally get {:,} consensus entries'.format(output.shape[0]))
-    print()
-    
-    output['Consensus'] = 1
-    
-    # 数据存入CSV文件
-    # if file does not exist write header
-    if ind==0:
-       output.to_csv(output_file, header=True, index=False)
-    else: # else it exists so append without writing the header
-       output.to_csv(output_file, mode='a', header=False, index=False)
-    
-    
-    # less efficient
-    status.append({'tRF_ID': trf,
-                   '#RNAhybrid': this_rnahybrid.shape[0], 
-                   '#IntaRNA': this_intarna.shape[0],
-                   '#Consensus': output.shape[0],
-                   'Pr_RNAhybrid': output.shape[0] / 2.0 / this_rnahybrid.shape[0],
-                   'Pr_IntaRNA': output.shape[0] / 2.0 / this_intarna.shape[0]})
-    
-    # update the consensus indicators in original RNAhybrid and IntaRNA predictors
-    for one_index in this_consensus_index:
-        if one_index.startswith('rnahybrid'):
-            rnahybrid_df.at[one_index, 'Consensus'] = 1
-        elif one_index.startswith('intarna'):
-            intarna_df.at[one_index, 'Consensus'] = 1
-        else:
-            raise Exception('invalid index in consensus evaluation!')
-
-# 保存统计结果
-pd.DataFrame(status).to_csv(os.path.join(output_path, 'tRF_level_consensus_stats.csv'), index=False)
 
-# save updated RNAhybrid and IntaRNA predictions
-rnahybrid_df.to_csv(rnahybrid_file, index=False)
-intarna_df.to_csv(intarna_file, index=False)
+with profileStage(paramdict['output_path'], 'Consensus', paramdict['profile']):
+    consensus_analysis(paramdict['rnahybrid_file'], paramdict['intarna_file'], paramdict['output_path'],
+                       paramdict['n_cores'], paramdict['streaming'], paramdict['materialize'], paramdict['format'])
 
     
 print('All tRFs entries checked. Elapsed time: {:.2f} hours'.format(
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""
+为RNAhybrid，IntaRNA或consensus结果中选定的entries生成interaction示意图（Demo column）
+配合callRNAhybrid.py和parseIntaRNA.py的-w选项使用：先只保存坐标和dot-bracket notation，筛选后再生成示意图
+使用-P选项时，用cProfile分析运行耗时
+"""
+
+
+from time import time
+import sys, os
+from getopt import getopt
+from trftarget.render import render_analysis
+from trftarget.profiling import profileStage
+
+start_time = time()
+
+
+###############主函数#####################################################
+def usage():
+    '''对主函数进行简介
+    '''
+    print('''
+python renderDemo.py [option][value]...
+    -h or --help        print this help messages
+    -i or --input       CSV or parquet file of RNAhybrid, IntaRNA or consensus results
+    -o or --output      CSV or parquet file for the selected entries with demos, the format is decided by the file extension
+    -d or --directory   directory of trfs_info and transcripts_info files. If ignored, the directory of the input file will be used
+    -q or --query       comma-separated tRF IDs. Only entries of these tRFs are rendered
+    -t or --target      comma-separated transcript IDs. Only entries of these transcripts are rendered
+    -e or --MFE         only entries with free energy no more than it are rendered
+    -m or --MCL         only entries with maximum complementary length no less than it are rendered
+    -P or --profile     profile the run with cProfile. The profile is saved in the folder profiles under the directory of the output file, together with a summary of the hot functions (render_profile.txt)
+''')
+
+# 如果没有任何参数，显示提示信息，并退出
+if len(sys.argv) == 1:
+    print('-h or --help for detail')
+    sys.exit(1)
+
+
+# 定义命令行参数
+# 短选项名后的冒号(:)表示该选项必须有附加的参数
+# 长选项名后的等号(=)表示该选项必须有附加的参数。
+shortargs = 'hi:o:d:q:t:e:m:P'
+longargs = ['help', 'input=', 'output=', 'directory=', 'query=', 'target=', 'MFE=', 'MCL=', 'profile']
+
+# 解析命令行参数
+# sys.argv[0]为python脚本名，后续全为参数
+# opts为分析出的参数信息，args为不符合格式信息的剩余参数
+opts, args = getopt(sys.argv[1:], shortargs, longargs)
+
+
+# 如果存在不符合格式信息的剩余参数，显示提示信息，并退出
+if args:
+    print('Invalid options exist!')
+    print('-h or --help for detail')
+    sys.exit(1)
+
+   
+# 定义dict类型的参数集，使得算法更稳健
+# 筛选条件为None时不筛选
+paramdict = {'input_file':None, 'output_file':None, 'info_path':None,
+             'trf_ids':None, 'tran_ids':None, 'MFE':None, 'MCL':None, 'profile':False}
+ 
+for opt,val in opts:
+    if opt in ('-h', '--help'):
+        usage()
+        sys.exit(1)
+        
+    if opt in ('-i', '--input'):
+        if not os.path.isfile(val):
+            # 输入不是一个确实存在的文件名
+            raise Exception('Invalid input result file!')
+        # 采用realpath函数，获得真实绝对路径
+        paramdict['input_file'] = os.path.realpath(val)
+        continue
+    
+    if opt in ('-o', '--output'):
+        paramdict['output_file'] = os.path.realpath(val)
+        continue
+    
+    if opt in ('-d', '--directory'):
+        if not os.path.isdir(val):
+            # 输入不是一个确实存在的文件夹
+            raise Exception('Invalid or not existed directory!')
+        paramdict['info_path'] = os.path.realpath(val)
+        continue
+    
+    if opt in ('-q', '--query'):
+        paramdict['trf_ids'] = [one_id.strip() for one_id in val.split(',')]
+        continue
+    
+    if opt in ('-t', '--target'):
+        paramdict['tran_ids'] = [one_id.strip() for one_id in val.split(',')]
+        continue
+    
+    if opt in ('-e', '--MFE'):
+        paramdict['MFE'] = float(val)
+        continue
+    
+    if opt in ('-m', '--MCL'):
+        paramdict['MCL'] = int(val)
+        continue
+    
+    if opt in ('-P', '--profile'):
+        paramdict['profile'] = True
+        continue
+
+# 检查参数是否齐全
+for k in ('input_file', 'output_file'):
+    if paramdict[k] is None:
+        raise Exception('Option "{}" is missing!'.format(k))
+
+print('Demo rendering options:')
+for k,v in paramdict.items():
+    print('{}: {}'.format(k, v))
+
+
+with profileStage(os.path.dirname(paramdict['output_file']), 'Render', paramdict['profile']):
+    render_analysis(paramdict['input_file'], paramdict['output_file'], paramdict['info_path'],
+                    paramdict['trf_ids'], paramdict['tran_ids'], paramdict['MFE'], paramdict['MCL'])
+
+
+print('Demo rendering completed. Elapsed time: {:.2f} hours'.format(
+        (time()-start_time)/3600.0))
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""
+用synthetic数据分别测量parseResult，parseDemo，getDemo，checkDuplicate，checkConsensus和表格读写的耗时，无需RNAhybrid和IntaRNA程序
+synthetic的tRF和transcript序列，以及RNAhybrid和IntaRNA输出保存在输出路径中，相同的规模和seed之后直接使用
+结果追加至benchmark_history.csv，并与同一规模和seed的上一次结果比较
+使用-P选项时，用cProfile分析运行耗时
+"""
+
+
+import sys, os
+from getopt import getopt
+from time import time
+from trftarget.benchmark import runBenchmark
+from trftarget.profiling import profileStage
+
+
+#############主函数#####################################################################
+def usage():
+    '''对主函数进行简介
+    '''
+    print('''
+python runBenchmark.py [option][value]...
+    -h or --help        print this help messages
+    -N or --n_hits      number of synthetic RNAhybrid interactions, e.g. 1e5. Several scales can be separated by comma, e.g. 1e3,1e5,1e7
+    -o or --outputpath  absolute or relative path for synthetic data and benchmark_history.csv. If ignored, the current path will be used
+    -q or --n_trfs      number of synthetic tRFs. Default value is 20
+    -b or --suboptimal  number of interactions of each tRF on each transcript. Default value is 3
+    -s or --seed        random seed of the synthetic data. Default value is 0
+    -l or --label       label saved with the results in benchmark_history.csv, e.g. a description of the machine. Default is empty
+    -P or --profile     profile the run with cProfile. The profile is saved in the folder profiles under the output path, together with a summary of the hot functions (benchmark_profile.txt)
+''')
+
+# 如果没有任何参数，显示提示信息，并退出
+if len(sys.argv) == 1:
+    print('-h or --help for detail')
+    sys.exit(1)
+
+
+# 定义命令行参数
+# 短选项名后的冒号(:)表示该选项必须有附加的参数
+# 长选项名后的等号(=)表示该选项必须有附加的参数。
+shortargs = 'hN:o:q:b:s:l:P'
+longargs = ['help', 'n_hits=', 'outputpath=', 'n_trfs=', 'suboptimal=', 'seed=', 'label=', 'profile']
+
+# 解析命令行参数
+# sys.argv[0]为python脚本名，后续全为参数
+# opts为分析出的参数信息，args为不符合格式信息的剩余参数
+opts, args = getopt(sys.argv[1:], shortargs, longargs)
+
+
+# 如果存在不符合格式信息的剩余参数，显示提示信息，并退出
+if args:
+    print('Invalid options exist!')
+    print('-h or --help for detail')
+    sys.exit(1)
+
+
+# 定义dict类型的参数集，使得算法更稳健
+paramdict = {'n_hits':None, 'output_path':os.getcwd(), 'n_trfs':20, 'suboptimal':3, 'seed':0, 'label':'', 'profile':False}
+
+for opt,val in opts:
+    if opt in ('-h', '--help'):
+        usage()
+        sys.exit(1)
+
+    if opt in ('-N', '--n_hits'):
+        # 可以使用1e5这样的写法
+        paramdict['n_hits'] = [int(float(one)) for one in val.split(',')]
+        continue
+
+    if opt in ('-o', '--outputpath'):
+        if not os.path.isdir(val):
+            # 输入不是一个确实存在的文件夹
+            raise Exception('Invalid or not existed directory!')
+        # 采用realpath函数，获得真实绝对路径
+        paramdict['output_path'] = os.path.realpath(val)
+        continue
+
+    if opt in ('-q', '--n_trfs'):
+        paramdict['n_trfs'] = int(val)
+        continue
+
+    if opt in ('-b', '--suboptimal'):
+        paramdict['suboptimal'] = int(val)
+        continue
+
+    if opt in ('-s', '--seed'):
+        paramdict['seed'] = int(val)
+        continue
+
+    if opt in ('-l', '--label'):
+        paramdict['label'] = val
+        continue
+
+    if opt in ('-P', '--profile'):
+        paramdict['profile'] = True
+        continue
+
+# 检查参数是否齐全
+for k,v in paramdict.items():
+    if v is None:
+        raise Exception('Option "{}" is missing!'.format(k))
+
+print('Benchmark options:')
+for k,v in paramdict.items():
+    print('{}: {}'.format(k, v))
+
+# 调用分析函数
+with profileStage(paramdict['output_path'], 'Benchmark', paramdict['profile']):
+    for n_hits in paramdict['n_hits']:
+        start_time = time()
+        print('----------------------------------')
+        print('Benchmark of {:,} interactions'.format(n_hits))
+        runBenchmark(paramdict['output_path'], n_hits, paramdict['n_trfs'], paramdict['suboptimal'],
+                     paramdict['seed'], paramdict['label'])
+        print('Benchmark completed. Elapsed time: {:.2f} hours.'.format((time()-start_time)/3600.0))
@@ -0,0 +1,21 @@
+# -*- coding: utf-8 -*-
+'''
+tRFtarget-pipeline共用的解析函数
+demo：生成interaction示意图，找到最长的连续匹配
+duplicate：确认重复entries
+rnahybrid：多进程调用RNAhybrid并解析结果（需要Biopython）
+intarna：调用IntaRNA并解析结果
+consensus：评估RNAhybrid和IntaRNA预测结果的一致性
+table：CSV和Parquet格式结果表格的读写
+seqstore：mmap读取的transcript序列库
+cache：RNAhybrid和IntaRNA结果的持久化缓存
+metrics：各stage的运行统计
+profiling：用cProfile分析各stage（包括子进程）的耗时
+render：按需生成结果的interaction示意图
+synthetic：生成synthetic序列及RNAhybrid和IntaRNA输出
+benchmark：用synthetic数据测量各解析函数和表格读写的耗时
+'''
+
+
+from .demo import getDemo, getMaxHitLen, getMaxHitDP, getHits
+from .duplicate import checkDuplicate
@@ -0,0 +1,240 @@
+# -*- coding: utf-8 -*-
+'''
+用synthetic数据（trftarget.synthetic生成并保存的RNAhybrid和IntaRNA输出）分别测量各解析函数和表格读写的耗时
+无需RNAhybrid和IntaRNA程序，相同的规模和seed使用完全相同的数据
+每个benchmark只计入被测函数本身的wall time和CPU time，不包括读文件和准备输入的时间
+结果追加至output_path中的benchmark_history.csv，每行为一个代码版本在一个规模下一个benchmark的耗时
+并与同一规模和seed的上一次结果比较，便于发现不同版本之间的性能退化
+'''
+
+
+import os
+import sys
+import resource
+import subprocess
+from contextlib import redirect_stdout
+from datetime import datetime, timezone
+from time import perf_counter, process_time
+import numpy as np
+import pandas as pd
+from .synthetic import makeSynthetic
+from .rnahybrid import parseResult, parseDemo, iterBlocks
+from .demo import getDemo
+from .duplicate import checkDuplicate
+from .consensus import checkConsensus
+from .intarna import readFasta, renameColumns, addColumns, cols
+from .table import pa, getTableFile, readTable, iterTable, writeTable, encodeTable, TableWriter
+from .metrics import rusageMB
+
+
+# 结果文件及其columns，规模和seed相同的结果可以比较
+HISTORY_FILE = 'benchmark_history.csv'
+SCALE_COLUMNS = ['N_Hits', 'N_tRFs', 'Hits_Per_Pair', 'Seed']
+HISTORY_COLUMNS = ['Version', 'Label', 'N_Hits', 'N_tRFs', 'Hits_Per_Pair', 'Seed', 'Benchmark', 'Items', 'UTC_Time',
+                   'Wall_Seconds', 'CPU_Seconds', 'Peak_RSS_MB', 'us_Per_Item']
+
+# 分块读写表格时每块的rows数目，与IntaRNA解析的chunksize一致
+CHUNK_SIZE = 100000
+
+
+class Stopwatch:
+    '''累计多段代码的wall time和CPU time，用with语句计时，只计入with中的代码
+    '''
+
+    def __init__(self, name):
+        self.name = name
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.items = 0
+
+    def __enter__(self):
+        self.start = (perf_counter(), process_time())
+        return self
+
+    def __exit__(self, *args):
+        self.wall += perf_counter() - self.start[0]
+        self.cpu += process_time() - self.start[1]
+
+    def record(self):
+        '''返回统计结果，peak RSS为进程启动以来的最大值
+        '''
+        return {'Benchmark': self.name, 'Items': self.items,
+                'UTC_Time': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+                'Wall_Seconds': round(self.wall, 4), 'CPU_Seconds': round(self.cpu, 4),
+                'Peak_RSS_MB': round(rusageMB(resource.getrusage(resource.RUSAGE_SELF)), 1),
+                'us_Per_Item': round(1e6*self.wall/max(self.items, 1), 3)}
+
+
+def getVersion():
+    '''当前代码的git版本，代码有未提交的修改时带"-dirty"，不在git repo中时为unknown
+    '''
+    try:
+        return subprocess.run(['git', 'describe', '--always', '--dirty'], cwd=os.path.dirname(os.path.abspath(__file__)),
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def getDemoPart(block):
+    '''RNAhybrid输出block中的示意图，处理方式与parseBlock一致
+    '''
+    third_part = block.split('\n\n')[2]
+    return third_part[third_part.find('\n'):].strip().replace('miRNA', 'tRF  ')
+
+
+def benchRNAhybrid(data_dir, n_trfs):
+    '''逐个tRF的RNAhybrid输出文件（相当于一个RNAhybrid job）测量parseResult，再对其中的示意图测量parseDemo
+    '''
+    parse_watch = Stopwatch('parseResult')
+    demo_watch = Stopwatch('parseDemo')
+    for i in range(n_trfs):
+        result_file = os.path.join(data_dir, 'rnahybrid', 'tRF_{:d}.txt'.format(i))
+        with open(result_file, 'rt') as f, parse_watch:
+            data, _ = parseResult(f)
+        parse_watch.items += data.shape[0]
+        with open(result_file, 'rt') as f:
+            demos = [getDemoPart(block) for block in iterBlocks(f)]
+        with demo_watch:
+            for demo in demos:
+                parseDemo(demo)
+        demo_watch.items += len(demos)
+    return [parse_watch.record(), demo_watch.record()]
+
+
+def benchIntaRNA(data_dir):
+    '''测量读入IntaRNA输出，对每个entry生成示意图（getDemo），以及确认重复entries（checkDuplicate）
+    返回统计结果，以及删除重复entries后的IntaRNA结果
+    '''
+    read_watch = Stopwatch('read IntaRNA output')
+    demo_watch = Stopwatch('getDemo')
+    dup_watch = Stopwatch('checkDuplicate')
+    tran_seq = {k: v.replace('T', 'U') for k, v in readFasta(os.path.join(data_dir, 'targets.fasta'))}
+    trf_seq = {k: v.replace('T', 'U') for k, v in readFasta(os.path.join(data_dir, 'trfs.fasta'))}
+
+    with read_watch:
+        data = pd.read_csv(os.path.join(data_dir, 'intarna_results.csv'), sep=';', dtype={'id1': str, 'id2': str})
+    read_watch.items = data.shape[0]
+    renameColumns(data)
+
+    args = zip(data['Transcript_ID'], data['Start_Target'], data['End_Target'], data['tRF_ID'],
+               data['Start_tRF'], data['End_tRF'], data['SubseqDP'], data['HybridDP'])
+    for tran_id, start1, end1, trf_id, start2, end2, subseq, hybrid in args:
+        full_seq1 = tran_seq[tran_id]
+        full_seq2 = trf_seq[trf_id]
+        with demo_watch:
+            getDemo(full_seq1, start1, end1, full_seq2, start2, end2, subseq, hybrid)
+    demo_watch.items = data.shape[0]
+
+    # 与IntaRNA结果解析相同的排序
+    data.sort_values(['tRF_ID', 'Transcript_ID', 'MFE'], kind='mergesort', inplace=True)
+    with dup_watch:
+        to_del = checkDuplicate(data)
+    dup_watch.items = data.shape[0]
+    data.drop(to_del, inplace=True)
+    return [read_watch.record(), demo_watch.record(), dup_watch.record()], data
+
+
+def benchConsensus(data_dir, intarna_df):
+    '''按loadConsensus的方式合并删除重复entries后的RNAhybrid和IntaRNA结果，测量checkConsensus
+    '''
+    watch = Stopwatch('checkConsensus')
+    rnahybrid_df = pd.read_csv(os.path.join(data_dir, 'rnahybrid_sites.csv'), dtype={'tRF_ID': str, 'Transcript_ID': str})
+    rnahybrid_df.sort_values(['tRF_ID', 'Transcript_ID', 'MFE'], kind='mergesort', inplace=True)
+    rnahybrid_df.drop(checkDuplicate(rnahybrid_df), inplace=True)
+    rnahybrid_df.set_index('rnahybrid_' + rnahybrid_df.index.astype(str), inplace=True)
+    intarna_df = intarna_df[rnahybrid_df.columns].set_index('intarna_' + intarna_df.index.astype(str))
+
+    all_df = pd.concat([rnahybrid_df, intarna_df], ignore_index=False)
+    trfs = pd.unique(rnahybrid_df.tRF_ID)
+    trf_rank = pd.Series(np.arange(len(trfs)), index=trfs)
+    sort_key = pd.DataFrame({'trf': trf_rank.reindex(all_df.tRF_ID).to_numpy(),
+                             'tran': all_df.Transcript_ID.to_numpy()})
+    sort_key.sort_values(['trf', 'tran'], kind='mergesort', inplace=True)
+    all_df = all_df.iloc[sort_key.index].assign(Demo='')
+
+    # 一对多的特例会打印出来，不计入输出
+    with open(os.devnull, 'wt') as devnull, redirect_stdout(devnull), watch:
+        checkConsensus(all_df, 2)
+    watch.items = all_df.shape[0]
+    return [watch.record()]
+
+
+def benchTables(intarna_df, directory):
+    '''用IntaRNA解析结果格式的表格，测量writeTable，readTable，iterTable和TableWriter（逐块encodeTable后写入）
+    安装了pyarrow时同时测量Parquet格式
+    '''
+    data = addColumns(intarna_df.copy())
+    data['Max_Hit_Len'] = 0
+    data = data[cols].reset_index(drop=True)
+    n = data.shape[0]
+    records = []
+    for file_format in (['csv', 'parquet'] if pa is not None else ['csv']):
+        table_file = getTableFile(directory, 'benchmark_table', file_format)
+        watches = [Stopwatch(name + ' ' + file_format) for name in ('writeTable', 'readTable', 'iterTable', 'TableWriter')]
+        with watches[0]:
+            writeTable(data, table_file)
+        with watches[1]:
+            readTable(table_file, dtype={'tRF_ID': str, 'Transcript_ID': str})
+        with watches[2]:
+            for _ in iterTable(table_file, CHUNK_SIZE, dtype={'tRF_ID': str, 'Transcript_ID': str}):
+                pass
+        with watches[3], TableWriter(table_file, cols) as writer:
+            for start in range(0, n, CHUNK_SIZE):
+                writer.write(encodeTable(data.iloc[start:start+CHUNK_SIZE], cols, file_format))
+        os.remove(table_file)
+        for watch in watches:
+            watch.items = n
+            records.append(watch.record())
+    return records
+
+
+def saveHistory(output_path, records):
+    '''追加至benchmark_history.csv，打印结果以及与同一benchmark，规模和seed上一次结果的比较
+    Ratio为本次与上一次wall time之比，大于1表示变慢
+    '''
+    history_file = os.path.join(output_path, HISTORY_FILE)
+    new = pd.DataFrame(records, columns=HISTORY_COLUMNS)
+    if os.path.isfile(history_file):
+        old = pd.read_csv(history_file, dtype={'Version': str, 'Label': str}, keep_default_na=False)
+        previous = old.drop_duplicates(['Benchmark'] + SCALE_COLUMNS, keep='last')
+    else:
+        previous = pd.DataFrame(columns=HISTORY_COLUMNS)
+    new.to_csv(history_file, mode='a', header=not os.path.isfile(history_file), index=False)
+
+    report = new.merge(previous[['Benchmark'] + SCALE_COLUMNS + ['Version', 'Wall_Seconds']],
+                       on=['Benchmark'] + SCALE_COLUMNS, how='left', suffixes=('', '_Previous'))
+    report['Ratio'] = (report['Wall_Seconds'] / report['Wall_Seconds_Previous'].astype(float)).round(2)
+    print('----------------------------------')
+    print(report[['Benchmark', 'Items', 'Wall_Seconds', 'CPU_Seconds', 'us_Per_Item',
+                  'Version_Previous', 'Wall_Seconds_Previous', 'Ratio']].to_string(index=False))
+    print('Benchmark results appended to "{}"'.format(history_file))
+    return report
+
+
+def runBenchmark(output_path, n_hits, n_trfs=20, hits_per_pair=3, seed=0, label=''):
+    '''生成（或直接使用已生成的）n_hits个RNAhybrid interactions规模的synthetic数据，测量所有benchmarks
+    synthetic数据保存在output_path中，之后的运行直接使用
+    '''
+    data_dir = os.path.join(output_path, 'synthetic_{:d}_{:d}_{:d}_{:d}'.format(int(n_hits), n_trfs, hits_per_pair, seed))
+    params = makeSynthetic(data_dir, n_hits, n_trfs, hits_per_pair, seed=seed)
+
+    records = []
+    print('Benchmark RNAhybrid output parsing...')
+    sys.stdout.flush()
+    records += benchRNAhybrid(data_dir, n_trfs)
+    print('Benchmark IntaRNA output parsing...')
+    sys.stdout.flush()
+    one_records, intarna_df = benchIntaRNA(data_dir)
+    records += one_records
+    print('Benchmark consensus...')
+    sys.stdout.flush()
+    records += benchConsensus(data_dir, intarna_df)
+    print('Benchmark table I/O...')
+    sys.stdout.flush()
+    records += benchTables(intarna_df, data_dir)
+
+    version = getVersion()
+    for record in records:
+        record.update({'Version': version, 'Label': label, 'N_Hits': params['n_hits'], 'N_tRFs': n_trfs,
+                       'Hits_Per_Pair': hits_per_pair, 'Seed': seed})
+    return saveHistory(output_path, records)
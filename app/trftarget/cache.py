@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+'''
+RNAhybrid和IntaRNA预测结果的持久化缓存
+key为(工具，query序列，target fasta文件digest，工具版本，参数)的hash，与tRF ID无关，每个tRF的结果保存为一个文件
+读取时更新文件的mtime，缓存总大小超过上限时，删除最久未使用的文件（LRU）
+累计的命中和淘汰次数保存在缓存文件夹的stats.json中
+'''
+
+
+import os
+import json
+import pickle
+import hashlib
+
+
+# 缓存文件格式的版本，解析结果的格式改变时需要更新，使旧的缓存失效
+CACHE_VERSION = 1
+
+
+def fileDigest(file_name, block_size=1<<20):
+    '''文件内容的sha256
+    '''
+    digest = hashlib.sha256()
+    with open(file_name, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ResultCache:
+    '''保存在directory中的缓存，max_size为缓存总大小的上限（bytes），None表示不限制
+    '''
+
+    def __init__(self, directory, max_size=None):
+        self.directory = directory
+        self.max_size = max_size
+        os.makedirs(directory, exist_ok=True)
+        # 本次运行的统计
+        self.stats = {'hits': 0, 'misses': 0, 'stored': 0, 'evicted': 0}
+
+    def getKey(self, *fields):
+        '''fields为可以转换为json的值
+        '''
+        return hashlib.sha256(json.dumps([CACHE_VERSION] + list(fields)).encode('utf-8')).hexdigest()
+
+    def getFile(self, key):
+        return os.path.join(self.directory, key[:2], key + '.pkl')
+
+    def contains(self, key):
+        '''是否存在缓存的结果，不读取，不计入统计
+        '''
+        return os.path.isfile(self.getFile(key))
+
+    def load(self, key):
+        '''返回缓存的结果，没有时返回None
+        '''
+        cache_file = self.getFile(key)
+        try:
+            with open(cache_file, 'rb') as f:
+                value = pickle.load(f)
+        except FileNotFoundError:
+            self.stats['misses'] += 1
+            return None
+        except Exception:
+            # 不完整或无法读取的文件，删除后重新计算
+            os.remove(cache_file)
+            self.stats['misses'] += 1
+            return None
+        # 更新最近使用时间
+        os.utime(cache_file)
+        self.stats['hits'] += 1
+        return value
+
+    def save(self, key, value):
+        '''先写入临时文件再替换，同时运行的多个任务共用缓存时不会读到不完整的文件
+        '''
+        cache_file = self.getFile(key)
+        os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+        tmp_file = '{}.{:d}.tmp'.format(cache_file, os.getpid())
+        with open(tmp_file, 'wb') as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_file, cache_file)
+        self.stats['stored'] += 1
+
+    def listFiles(self):
+        '''返回所有缓存文件的(最近使用时间, 大小, 文件名)
+        '''
+        files = []
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                if name.endswith('.pkl'):
+                    one_file = os.path.join(root, name)
+                    stat = os.stat(one_file)
+                    files.append((stat.st_mtime, stat.st_size, one_file))
+        return files
+
+    def evict(self):
+        '''删除最久未使用的文件，直至缓存总大小不超过上限
+        '''
+        files = self.listFiles()
+        total = sum(size for _, size, _ in files)
+        if self.max_size is not None and total > self.max_size:
+            for _, size, one_file in sorted(files):
+                if total <= self.max_size:
+                    break
+                os.remove(one_file)
+                total -= size
+                self.stats['evicted'] += 1
+        return total
+
+    def report(self):
+        '''淘汰超出上限的文件，打印本次运行和累计的统计，累计统计保存至stats.json
+        返回本次运行的统计
+        '''
+        total = self.evict()
+        n_files = len(self.listFiles())
+        stats_file = os.path.join(self.directory, 'stats.json')
+        try:
+            with open(stats_file, 'rt') as f:
+                cumulative = json.load(f)
+        except (FileNotFoundError, ValueError):
+            cumulative = {}
+        for k, v in self.stats.items():
+            cumulative[k] = cumulative.get(k, 0) + v
+        cumulative['runs'] = cumulative.get('runs', 0) + 1
+        with open(stats_file, 'wt') as f:
+            json.dump(cumulative, f, indent=2)
+
+        print('----------------------------------')
+        print('Result cache "{}": {:,} hits, {:,} misses, {:,} stored, {:,} evicted'.format(
+                self.directory, self.stats['hits'], self.stats['misses'], self.stats['stored'], self.stats['evicted']))
+        print('Cache size: {:,} entries, {:.1f} MB{}'.format(n_files, total/2**20,
+              '' if self.max_size is None else ' (limit {:.1f} MB)'.format(self.max_size/2**20)))
+        lookups = cumulative['hits'] + cumulative['misses']
+        print('Since created: {:,} runs, {:,} hits, {:,} misses ({:.1%} hit rate), {:,} evicted'.format(
+                cumulative['runs'], cumulative['hits'], cumulative['misses'],
+                cumulative['hits']/lookups if lookups > 0 else 0.0, cumulative['evicted']))
+        return dict(self.stats)
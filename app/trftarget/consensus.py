@@ -0,0 +1,569 @@
+# -*- coding: utf-8 -*-
+'''
+评估RNAhybrid和IntaRNA预测结果的一致性
+一致性判断基于checkDuplicate函数（确认IntaRNA结果中的重复entries）改写而成
+经过考虑，offset bases threshold设为2，即前后可以相差2个bases
+
+Update: add a consensus indicator column in the original RNAhybrid and IntaRNA predictions
+Update: 两个结果只分组排序一次，按Start_Target排序后做区间join，不再逐个tRF筛选和两两比较
+Update: 按tRF分块，多进程进行一致性判断
+Update: streaming mode，对已按(tRF_ID, Transcript_ID)排序的结果文件分块归并，RAM不随entries数目增长
+Update: Consensus flags保存为sidecar文件（bitmap），不再重写整个结果文件；需要时再用materializeFlags写入结果文件
+Update: 输入和输出文件可以是CSV或Parquet格式
+Update: 各步骤的wall time，CPU time，peak RSS和entries数目保存为consensus_metrics.json和consensus_metrics.csv
+Update: streaming mode中未排序的结果文件（例如按tRF输入顺序保存的RNAhybrid结果）先分块排序再归并，不再报错
+'''
+
+
+import pandas as pd
+import numpy as np
+import os
+from tqdm import tqdm
+from multiprocessing import Pool
+from shutil import rmtree
+from .table import getTableFile, isParquet, readTable, iterTable, readColumns, writeTable, setColumn, TableWriter
+from .metrics import Meter, fileSize, saveReport
+from .intarna import mergeRuns
+
+
+###############Consensus函数#####################################################
+def findConsensus(dataframe, offset):
+    '''检查所有记录，返回一致的entries的位置
+    一致的定义为：同一tRF和同一transcript的记录中，target起止位置在+/-offset个base之内
+    dataframe需按(tRF_ID, Transcript_ID)排好序，同一组内RNAhybrid记录在前，IntaRNA记录在后
+    每条记录与排在它前面的记录比较，配对上第一条即可，二者的位置都加入输出
+    IntaRNA和RNAhybrid的重复entries都已经delete，因此consensus记录一般是一一对应
+    '''
+    
+    n = dataframe.shape[0]
+    if n == 0:
+        return np.empty(0, dtype=np.int64)
+    
+    # rank of each entry in the input order
+    rank = np.arange(n)
+    trf_ids = dataframe['tRF_ID'].to_numpy()
+    tran_ids = dataframe['Transcript_ID'].to_numpy()
+    # consecutive entries with the same tRF and transcript form one group
+    new_group = (trf_ids[1:] != trf_ids[:-1]) | (tran_ids[1:] != tran_ids[:-1])
+    group = np.concatenate(([0], np.cumsum(new_group)))
+    start = dataframe['Start_Target'].to_numpy(dtype=np.int64)
+    end = dataframe['End_Target'].to_numpy(dtype=np.int64)
+    
+    # sort by group, then Start_Target
+    order = np.lexsort((rank, start, group))
+    s_group = group[order]
+    s_start = start[order]
+    s_end = end[order]
+    s_rank = rank[order]
+    
+    later = []
+    earlier = []
+    lag = 1
+    while lag < n:
+        # start difference is non-negative after sorting
+        diff_start = s_start[lag:] - s_start[:-lag]
+        in_window = (s_group[lag:] == s_group[:-lag]) & (diff_start <= offset)
+        # start differences only grow with lag, no more pairs to check
+        if not in_window.any():
+            break
+        hit = in_window & (np.abs(s_end[lag:] - s_end[:-lag]) <= offset)
+        later.append(np.maximum(s_rank[lag:], s_rank[:-lag])[hit])
+        earlier.append(np.minimum(s_rank[lag:], s_rank[:-lag])[hit])
+        lag += 1
+    
+    if len(later) == 0:
+        return np.empty(0, dtype=np.int64)
+    later = np.concatenate(later)
+    earlier = np.concatenate(earlier)
+    
+    # 每条记录只保留排在最前面的配对记录
+    pair_order = np.lexsort((earlier, later))
+    later, first = np.unique(later[pair_order], return_index=True)
+    earlier = earlier[pair_order][first]
+    
+    # 配对二者相邻排列
+    output = np.empty(2*later.shape[0], dtype=np.int64)
+    output[0::2] = later
+    output[1::2] = earlier
+    
+    # 同一tRF和transcript中一致的entries数目为奇数时，存在一对多情况
+    counts = np.bincount(output, minlength=n)
+    for one_group in np.unique(group[counts > 1]):
+        in_group = group == one_group
+        if np.count_nonzero(counts[in_group]) % 2 == 1:
+            print('########################################')
+            print('Special cases exist for tRF "{}" and transcript "{}"'.format(
+                    trf_ids[in_group][0], tran_ids[in_group][0]))
+            for pos in np.flatnonzero(in_group & (counts > 1)):
+                # 输出特例
+                print(dataframe['Demo'].iat[pos])
+            print('########################################')
+    
+    return output
+
+
+def checkConsensus(dataframe, offset):
+    '''检查所有记录，返回一致的rows，以及它们的index（相邻两两配对，利于网页展示）
+    dataframe的要求同findConsensus
+    '''
+    output = findConsensus(dataframe, offset)
+    return dataframe.iloc[output], dataframe.index[output].tolist()
+
+
+# 多进程判断一致性时使用的dataframe，在子进程中通过initConsensus设置
+combined = None
+
+
+def initConsensus(dataframe):
+    '''进程池的initializer，设置排好序的dataframe
+    fork方式创建子进程时无需复制
+    '''
+    global combined
+    combined = dataframe
+
+
+def checkPart(bounds):
+    '''判断第bounds[0]至bounds[1]行（包含完整的若干tRFs）的一致性
+    返回一致的entries在整个dataframe中的位置
+    '''
+    return findConsensus(combined.iloc[bounds[0]:bounds[1]], 2) + bounds[0]
+
+
+def splitTRFs(trf_codes, n_parts):
+    '''将按tRF排好序的rows分成n_parts块，每块entries数目接近，且同一tRF不会被分开
+    返回每块的起止位置
+    '''
+    n = trf_codes.shape[0]
+    # 每个tRF的起始位置
+    starts = np.flatnonzero(np.concatenate(([True], trf_codes[1:] != trf_codes[:-1])))
+    starts = np.concatenate((starts, [n]))
+    # 每块在最接近等分点的tRF起始位置处截断
+    cuts = np.unique(starts[np.searchsorted(starts, np.linspace(0, n, n_parts+1)[1:-1])])
+    bounds = np.concatenate(([0], cuts[(cuts > 0) & (cuts < n)], [n]))
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+# 每次读入的entries数目
+chunksize = 1e5
+
+
+def getStatus(trfs, n_rnahybrid, n_intarna, n_cons):
+    '''生成每个tRF的统计结果
+    n_rnahybrid，n_intarna，n_cons为以tRF ID索引的entries数目
+    '''
+    status = pd.DataFrame({'tRF_ID': trfs})
+    status['#RNAhybrid'] = pd.Series(n_rnahybrid, dtype=np.int64).reindex(trfs, fill_value=0).to_numpy()
+    status['#IntaRNA'] = pd.Series(n_intarna, dtype=np.int64).reindex(trfs, fill_value=0).to_numpy()
+    status['#Consensus'] = pd.Series(n_cons, dtype=np.int64).reindex(trfs, fill_value=0).to_numpy()
+    status['Pr_RNAhybrid'] = status['#Consensus'] / 2.0 / status['#RNAhybrid']
+    status['Pr_IntaRNA'] = status['#Consensus'] / 2.0 / status['#IntaRNA']
+    return status
+
+
+def getFlagFile(result_file):
+    '''结果文件对应的sidecar文件名，保存每一行的Consensus flag
+    '''
+    return os.path.splitext(result_file)[0] + '.consensus.npz'
+
+
+def saveFlags(flag_file, packed, n_rows):
+    '''保存Consensus flags的bitmap
+    packed为packbits后的bytes（list），n_rows为结果文件的行数（不含header）
+    先写入临时文件再替换，重复运行时不会留下不完整的文件
+    '''
+    tmp_file = flag_file + '.tmp'
+    with open(tmp_file, 'wb') as f:
+        np.savez_compressed(f, n_rows=n_rows, bits=np.concatenate(packed + [np.empty(0, dtype=np.uint8)]))
+    os.replace(tmp_file, flag_file)
+
+
+def loadFlags(flag_file):
+    '''读取sidecar文件，返回每一行是否为consensus的bool array
+    '''
+    with np.load(flag_file) as data:
+        return np.unpackbits(data['bits'], count=int(data['n_rows'])).astype(bool)
+
+
+def materializeFlags(result_file, flag_file=None, block_size=1<<26):
+    '''将sidecar中的Consensus flags写入结果文件的最后一列（in place）
+    不解析CSV，直接处理bytes：引号之外的换行符为一条记录的结束，在其之前插入",0"或",1"
+    结果文件已有Consensus column（最后一列）时，直接替换其中的值，因此可以重复运行
+    Parquet文件逐个row group重写，加入或替换Consensus column
+    '''
+    if flag_file is None:
+        flag_file = getFlagFile(result_file)
+    flags = loadFlags(flag_file)
+    if isParquet(result_file):
+        setColumn(result_file, 'Consensus', flags.astype(np.int64))
+        return
+    tmp_file = result_file + '.tmp'
+    
+    row = 0
+    # 当前位置是否在引号之内
+    quoted = 0
+    valid = True
+    with open(result_file, 'rb') as fin, open(tmp_file, 'wb') as fout:
+        header = fin.readline()
+        line_end = b'\r\n' if header.endswith(b'\r\n') else b'\n'
+        names = header[:len(header)-len(line_end)]
+        replace = names.split(b',')[-1] == b'Consensus'
+        if not replace:
+            header = names + b',Consensus' + line_end
+        fout.write(header)
+        
+        while True:
+            # 每块都在换行符处结束
+            block = fin.read(block_size)
+            if not block:
+                break
+            if not block.endswith(b'\n'):
+                block += fin.readline()
+            buf = np.frombuffer(block, dtype=np.uint8)
+            quote_pos = np.flatnonzero(buf == ord('"'))
+            newline_pos = np.flatnonzero(buf == ord('\n'))
+            ends = newline_pos[(quoted + np.searchsorted(quote_pos, newline_pos)) % 2 == 0]
+            quoted = (quoted + quote_pos.shape[0]) % 2
+            ends -= len(line_end) - 1
+            
+            if row + ends.shape[0] > flags.shape[0]:
+                valid = False
+                break
+            values = np.where(flags[row:row+ends.shape[0]], ord('1'), ord('0')).astype(np.uint8)
+            if replace:
+                # 已有的Consensus值只有1位
+                if not (buf[ends-2] == ord(',')).all():
+                    valid = False
+                    break
+                buf = buf.copy()
+                buf[ends-1] = values
+            else:
+                commas = np.full(ends.shape[0], ord(','), dtype=np.uint8)
+                buf = np.insert(buf, np.repeat(ends, 2), np.column_stack((commas, values)).ravel())
+            fout.write(buf.tobytes())
+            row += ends.shape[0]
+
+    if not valid or row != flags.shape[0]:
+        os.remove(tmp_file)
+        raise Exception('Consensus flags in "{}" do not match the entries in "{}"!'.format(flag_file, result_file))
+    os.replace(tmp_file, result_file)
+
+
+def checkSorted(file_name):
+    '''分块读取结果文件，检查其是否已按(tRF_ID, Transcript_ID)排序
+    返回(是否已排序, 行数)
+    '''
+    last = None
+    ordered = True
+    n_rows = 0
+    for chunk in iterTable(file_name, int(chunksize), dtype={'tRF_ID': str, 'Transcript_ID': str}):
+        n_rows += chunk.shape[0]
+        if chunk.shape[0] == 0 or not ordered:
+            continue
+        trf_ids = chunk['tRF_ID'].to_numpy()
+        tran_ids = chunk['Transcript_ID'].to_numpy()
+        if last is not None:
+            trf_ids = np.concatenate(([last[0]], trf_ids))
+            tran_ids = np.concatenate(([last[1]], tran_ids))
+        ordered = bool(((trf_ids[1:] > trf_ids[:-1]) | ((trf_ids[1:] == trf_ids[:-1]) & (tran_ids[1:] >= tran_ids[:-1]))).all())
+        last = (trf_ids[-1], tran_ids[-1])
+    return ordered, n_rows
+
+
+def readSorted(file_name):
+    '''分块读取已排序的结果文件，加入原始行号Row
+    '''
+    row = 0
+    for chunk in iterTable(file_name, int(chunksize), dtype={'tRF_ID': str, 'Transcript_ID': str}):
+        if chunk.shape[0] == 0:
+            continue
+        chunk['Row'] = np.arange(row, row+chunk.shape[0])
+        row += chunk.shape[0]
+        yield chunk
+
+
+def sortRuns(file_name, directory, prefix):
+    '''未排序的结果文件（例如按tRF输入顺序保存的RNAhybrid结果）分块读取，加入原始行号Row
+    每块按(tRF_ID, Transcript_ID)排序后保存为临时文件（文件名以prefix开头），之后由intarna.mergeRuns多路归并
+    返回所有临时文件名
+    '''
+    os.makedirs(directory, exist_ok=True)
+    runs = []
+    row = 0
+    for ind, chunk in enumerate(iterTable(file_name, int(chunksize), dtype={'tRF_ID': str, 'Transcript_ID': str})):
+        if chunk.shape[0] == 0:
+            continue
+        chunk['Row'] = np.arange(row, row+chunk.shape[0])
+        row += chunk.shape[0]
+        chunk.sort_values(['tRF_ID', 'Transcript_ID'], kind='mergesort', inplace=True)
+        run_file = os.path.join(directory, '{}run_{:d}.csv'.format(prefix, ind))
+        chunk.to_csv(run_file, index=False)
+        runs.append(run_file)
+    return runs
+
+
+def indexRows(reader, prefix, trfs=None):
+    '''index设为prefix加原始行号，与整体读入时一致
+    trfs不为None时，将读到的tRF ID加入该set
+    '''
+    for chunk in reader:
+        if trfs is not None:
+            trfs.update(chunk['tRF_ID'].unique())
+        chunk.index = prefix + chunk['Row'].astype(str).to_numpy()
+        yield chunk
+
+
+def setFlags(bits, rows):
+    '''将bitmap bits（packbits的格式）中第rows行的flag设为1
+    '''
+    rows = np.asarray(rows, dtype=np.int64)
+    np.bitwise_or.at(bits, rows >> 3, (0x80 >> (rows & 7)).astype(np.uint8))
+
+
+def mergeSorted(readers):
+    '''多路归并已排序的结果文件
+    每次返回各文件的一部分rows（没有则为None），其中每个tRF和transcript的记录都是完整的
+    '''
+    
+    def lessThan(dataframe, key):
+        '''返回(tRF_ID, Transcript_ID)小于key的rows
+        '''
+        return (dataframe['tRF_ID'] < key[0]) | ((dataframe['tRF_ID'] == key[0]) & (dataframe['Transcript_ID'] < key[1]))
+    
+    def lastKey(dataframe):
+        return dataframe['tRF_ID'].iat[-1], dataframe['Transcript_ID'].iat[-1]
+    
+    buffers = [next(reader, None) for reader in readers]
+    # 是否已读完
+    finished = [buffer is None for buffer in buffers]
+    
+    while True:
+        # 未读完的文件中，最后一条记录之前的tRF和transcript已经完整
+        pending = [i for i in range(len(readers)) if not finished[i]]
+        threshold = min(lastKey(buffers[i]) for i in pending) if pending else None
+        
+        parts = []
+        for i in range(len(readers)):
+            if buffers[i] is None:
+                parts.append(None)
+            elif threshold is None:
+                parts.append(buffers[i])
+                buffers[i] = None
+            else:
+                mask = lessThan(buffers[i], threshold)
+                parts.append(buffers[i][mask])
+                buffers[i] = buffers[i][~mask]
+        
+        if any(part is not None and part.shape[0] > 0 for part in parts):
+            yield parts
+        
+        if threshold is None:
+            break
+        
+        # 最后一条记录等于threshold的文件，需要继续读入
+        for i in pending:
+            if lastKey(buffers[i]) == threshold:
+                tmp = next(readers[i], None)
+                if tmp is None:
+                    finished[i] = True
+                else:
+                    buffers[i] = pd.concat([buffers[i], tmp])
+
+
+def streamConsensus(rnahybrid_file, intarna_file, output_path, file_format='csv'):
+    '''streaming mode检查RNAhybrid和IntaRNA结果的一致性
+    两个文件按(tRF_ID, Transcript_ID)分块归并后逐块判断一致性并写入结果，因此结果按tRF_ID排序
+    未排序的文件（例如按tRF输入顺序保存的RNAhybrid结果）先在output_path中的临时文件夹分块排序，再多路归并
+    Consensus flags按原始行号记录在bitmap中，最后保存为sidecar文件
+    返回RNAhybrid，IntaRNA和consensus entries数目
+    '''
+    
+    output_file = getTableFile(output_path, 'consensus_results', file_format)
+    tmp_dir = os.path.join(output_path, 'consensus_tmp_files')
+    
+    # 结果文件中已有的Consensus column会被覆盖
+    rnahybrid_cols = [one_col for one_col in readColumns(rnahybrid_file) if one_col != 'Consensus'] + ['Consensus']
+    
+    # RNAhybrid结果中已读到的tRFs，只有这些tRFs的IntaRNA记录参与判断
+    # 归并时某个tRF的IntaRNA记录参与判断时，如果RNAhybrid结果中存在该tRF，一定已经读到
+    rnahybrid_trfs = set()
+    readers = []
+    # 两个文件的行数，以及按原始行号保存的flags
+    n_rows = []
+    bits = []
+    for file_name, prefix, trfs in ((rnahybrid_file, 'rnahybrid_', rnahybrid_trfs), (intarna_file, 'intarna_', None)):
+        ordered, n = checkSorted(file_name)
+        if ordered:
+            reader = readSorted(file_name)
+        else:
+            print('File "{}" is not sorted by tRF_ID and Transcript_ID, sorting it in chunks...'.format(file_name))
+            # mergeRuns在每个tRF和transcript内按MFE排序，这里恢复原始行的顺序
+            reader = (chunk.sort_values(['tRF_ID', 'Transcript_ID', 'Row'], kind='mergesort')
+                      for chunk in mergeRuns(sortRuns(file_name, tmp_dir, prefix)))
+        readers.append(indexRows(reader, prefix, trfs))
+        n_rows.append(n)
+        bits.append(np.zeros((n+7) // 8, dtype=np.uint8))
+    
+    writer = TableWriter(output_file, rnahybrid_cols)
+    
+    # 按tRF_ID顺序记录tRFs
+    trfs = {}
+    n_rnahybrid = {}
+    n_intarna = {}
+    n_cons = {}
+    n_total = [0, 0, 0]
+    
+    for rnahybrid_part, intarna_part in tqdm(mergeSorted(readers)):
+    
+        parts = []
+        if rnahybrid_part is not None:
+            parts.append(rnahybrid_part)
+            for k, v in rnahybrid_part['tRF_ID'].value_counts(sort=False).items():
+                trfs[k] = None
+                n_rnahybrid[k] = n_rnahybrid.get(k, 0) + v
+        if intarna_part is not None:
+            intarna_use = intarna_part.loc[intarna_part['tRF_ID'].isin(rnahybrid_trfs)]
+            parts.append(intarna_use)
+            for k, v in intarna_use['tRF_ID'].value_counts(sort=False).items():
+                n_intarna[k] = n_intarna.get(k, 0) + v
+    
+        # stable sort, RNAhybrid entries stay before IntaRNA entries within each tRF and transcript
+        batch = pd.concat(parts).sort_values(['tRF_ID', 'Transcript_ID'], kind='mergesort')
+        positions = findConsensus(batch, 2)
+        output = batch.iloc[positions].assign(Consensus=1)
+        writer.write(output)
+        for k, v in output['tRF_ID'].value_counts(sort=False).items():
+            n_cons[k] = n_cons.get(k, 0) + v
+    
+        # update the consensus indicators at the original rows
+        consensus_index = batch.index[positions]
+        for i, part in enumerate((rnahybrid_part, intarna_part)):
+            if part is not None:
+                setFlags(bits[i], part['Row'].to_numpy()[part.index.isin(consensus_index)])
+                n_total[i] += part.shape[0]
+        n_total[2] += output.shape[0]
+    
+    writer.close()
+    if os.path.isdir(tmp_dir):
+        rmtree(tmp_dir)
+    print('Read {:,} RNAhybrid entries'.format(n_total[0]))
+    print('Read {:,} IntaRNA entries'.format(n_total[1]))
+    print('total {:d} tRFs'.format(len(trfs)))
+    print('Finally get {:,} consensus entries'.format(n_total[2]))
+    
+    # 保存统计结果
+    getStatus(list(trfs), n_rnahybrid, n_intarna, n_cons).to_csv(
+            os.path.join(output_path, 'tRF_level_consensus_stats.csv'), index=False)
+    
+    # save the consensus indicators of RNAhybrid and IntaRNA predictions
+    saveFlags(getFlagFile(rnahybrid_file), [bits[0]], n_rows[0])
+    saveFlags(getFlagFile(intarna_file), [bits[1]], n_rows[1])
+    return n_total
+
+
+def consensus_analysis(rnahybrid_file, intarna_file, output_path, n_cores=1, streaming=False, materialize=False, file_format='csv'):
+    '''检查RNAhybrid和IntaRNA结果（CSV或Parquet格式）的一致性
+    一致的entries保存为output_path中的consensus_results.csv（或.parquet，由file_format决定），统计结果保存为tRF_level_consensus_stats.csv
+    RNAhybrid和IntaRNA结果的Consensus flags保存为各自的sidecar文件，不修改结果文件
+    n_cores > 1时，按tRF分块多进程判断，结果仍按tRF顺序输出
+    streaming为True时，分块读入并逐块判断，此时不使用多进程；未按(tRF_ID, Transcript_ID)排序的文件先在磁盘上分块排序
+    materialize为True时，将Consensus column写入RNAhybrid和IntaRNA结果文件
+    各步骤的运行统计保存为consensus_metrics.json和consensus_metrics.csv
+    '''
+    
+    meter = Meter(children=True)
+    step_meter = Meter()
+    if streaming:
+        n_total = streamConsensus(rnahybrid_file, intarna_file, output_path, file_format)
+    else:
+        n_total = loadConsensus(rnahybrid_file, intarna_file, output_path, n_cores, file_format)
+    output_size = fileSize(getTableFile(output_path, 'consensus_results', file_format))
+    records = [step_meter.record('Consensus', 'check consensus', Entries_In=n_total[0]+n_total[1],
+                                 Entries_Kept=n_total[2], Bytes_Written=output_size)]
+    
+    if materialize:
+        for result_file, n_entries in zip((rnahybrid_file, intarna_file), n_total):
+            step_meter = Meter()
+            materializeFlags(result_file)
+            print('Consensus column written to file {}'.format(result_file))
+            records.append(step_meter.record('Consensus', 'materialize ' + os.path.basename(result_file),
+                                             Entries_In=n_entries, Bytes_Written=fileSize(result_file)))
+    
+    saveReport(output_path, 'Consensus', records, meter.record('Consensus', 'total',
+               Entries_In=n_total[0]+n_total[1], Entries_Kept=n_total[2],
+               Bytes_Written=sum(record['Bytes_Written'] for record in records)))
+
+
+def loadConsensus(rnahybrid_file, intarna_file, output_path, n_cores=1, file_format='csv'):
+    '''一次性读入RNAhybrid和IntaRNA结果，检查一致性
+    返回RNAhybrid，IntaRNA和consensus entries数目
+    '''
+    
+    output_file = getTableFile(output_path, 'consensus_results', file_format)
+    
+    
+    # Read all results at once, it will cost huge RAM
+
+    # Read RNAhybrid results
+    rnahybrid_df = readTable(rnahybrid_file, dtype={'tRF_ID': str, 'Transcript_ID': str})
+    print('Read {:,} RNAhybrid entries'.format(rnahybrid_df.shape[0]))
+    # modify index to be different with IntaRNA entries
+    rnahybrid_df.set_index('rnahybrid_' + rnahybrid_df.index.astype(str), inplace=True)
+    rnahybrid_df['Consensus'] = 0
+
+    intarna_df = readTable(intarna_file, dtype={'tRF_ID': str, 'Transcript_ID': str})
+    print('Read {:,} IntaRNA entries'.format(intarna_df.shape[0]))
+    # modify index to be different with RNAhybrid entries
+    intarna_df.set_index('intarna_' + intarna_df.index.astype(str), inplace=True)
+    intarna_df['Consensus'] = 0
+
+    # 所有tRFs，按RNAhybrid结果中出现的顺序
+    trfs = pd.unique(rnahybrid_df.tRF_ID)
+    print('total {:d} tRFs'.format(len(trfs)))
+    
+    
+    # 合并两个结果，只排序一次
+    # the columns of RNAhybrid and IntaRNA are already setted to the same order
+    all_df = pd.concat([rnahybrid_df, intarna_df.loc[intarna_df.tRF_ID.isin(trfs)]], ignore_index=False)
+    trf_rank = pd.Series(np.arange(len(trfs)), index=trfs)
+    # stable sort, RNAhybrid entries stay before IntaRNA entries within each tRF and transcript
+    sort_key = pd.DataFrame({'trf': trf_rank.reindex(all_df.tRF_ID).to_numpy(),
+                             'tran': all_df.Transcript_ID.to_numpy()})
+    sort_key.sort_values(['trf', 'tran'], kind='mergesort', inplace=True)
+    all_df = all_df.iloc[sort_key.index]
+    
+    # Check Consensus
+    if n_cores > 1:
+        print('{:d} CPUs will be used for checking consensus.'.format(n_cores))
+        parts = splitTRFs(sort_key['trf'].to_numpy(), 4*n_cores)
+        pool = Pool(n_cores, initializer=initConsensus, initargs=(all_df,))
+        # imap keeps the order of parts
+        positions = list(pool.imap(checkPart, parts))
+        pool.close()
+        pool.join()
+        positions = np.concatenate(positions)
+        output = all_df.iloc[positions]
+        consensus_index = all_df.index[positions]
+    else:
+        output, consensus_index = checkConsensus(all_df, 2)
+    print('Finally get {:,} consensus entries'.format(output.shape[0]))
+    del all_df, sort_key
+    
+    output = output.copy()
+    output['Consensus'] = 1
+    
+    # 保存数据
+    writeTable(output, output_file)
+    
+    
+    # 统计结果
+    status = getStatus(trfs, rnahybrid_df.tRF_ID.value_counts(), intarna_df.tRF_ID.value_counts(),
+                       output.tRF_ID.value_counts())
+    
+    # 保存统计结果
+    status.to_csv(os.path.join(output_path, 'tRF_level_consensus_stats.csv'), index=False)
+
+    # save the consensus indicators of RNAhybrid and IntaRNA predictions
+    consensus_index = pd.Index(consensus_index).unique()
+    saveFlags(getFlagFile(rnahybrid_file), [np.packbits(rnahybrid_df.index.isin(consensus_index))], rnahybrid_df.shape[0])
+    saveFlags(getFlagFile(intarna_file), [np.packbits(intarna_df.index.isin(consensus_index))], intarna_df.shape[0])
+    return rnahybrid_df.shape[0], intarna_df.shape[0], output.shape[0]
@@ -0,0 +1,428 @@
+# -*- coding: utf-8 -*-
+'''
+生成interaction的plain text示意图，RNAhybrid和IntaRNA的结果解析共用
+由callRNAhybrid.py和parseIntaRNA.py中的getDemo函数改写而成，输出完全一致
+1) 匹配符号改为查表，不再为每个base pair新建set
+2) 示意图的各行先写入预分配的list，最后一次性join，避免重复的字符串拼接
+3) 内部函数移至模块层，避免每次调用时重新定义
+函数getMaxHitLen，getMaxHitDP从示意图中找到最长的连续匹配
+函数getHits直接从dot-bracket notation找到最长的连续匹配，无需生成示意图，结果与上述两个函数一致
+'''
+
+
+# 匹配符号，'|'表示匹配，':'表示G-U不稳定匹配
+PAIR_SYMBOL = {'AU': '|', 'UA': '|', 'CG': '|', 'GC': '|',
+               'GU': ':', 'UG': ':'}
+
+
+def getInteractDemo(seq1, seq2, match1, match2):
+    '''构建interaction区域示意图
+    tRF已经经过反转，从左至右处理即可
+    返回5行：target中非匹配base，target中匹配base，匹配符号，tRF中匹配base，tRF中非匹配base
+    '''
+
+    len1 = len(seq1)
+    len2 = len(seq2)
+    # 每一列至少消耗1个base，因此列数不超过len1+len2
+    n_col = len1 + len2
+    line1 = [' '] * n_col # target中非匹配base
+    line2 = [' '] * n_col # target中匹配base
+    line3 = [' '] * n_col # 匹配符号，'|'表示匹配，':'表示G-U不稳定匹配
+    line4 = [' '] * n_col # tRF中匹配base
+    line5 = [' '] * n_col # tRF中非匹配base
+    # tRF和target分别使用index
+    ind1 = 0
+    ind2 = 0
+    col = 0
+
+    while (ind1<len1) and (ind2<len2):
+        m1 = match1[ind1]
+        m2 = match2[ind2]
+        # 共4种符号pattern
+        if m1 == '(' and m2 == ')':
+            # 第1种，匹配
+            base1 = seq1[ind1]
+            base2 = seq2[ind2]
+            symbol = PAIR_SYMBOL.get(base1+base2)
+            if symbol is None:
+                raise Exception('Invalid complementary base pair "{}"-"{}"!'.format(base1, base2))
+            line2[col] = base1
+            line3[col] = symbol
+            line4[col] = base2
+            ind1 += 1
+            ind2 += 1
+        elif m1 == '.' and m2 == '.':
+            # 第2种，都不匹配
+            line1[col] = seq1[ind1]
+            line5[col] = seq2[ind2]
+            ind1 += 1
+            ind2 += 1
+        elif m1 == '(' and m2 == '.':
+            # 第3种，target匹配，tRF不匹配
+            # 此时target处出现空格，跳过1格
+            line5[col] = seq2[ind2]
+            ind2 += 1
+        elif m1 == '.' and m2 == ')':
+            # 第4种，target不匹配，tRF匹配
+            # 此时tRF处出现空格，跳过1格
+            line1[col] = seq1[ind1]
+            ind1 += 1
+        else:
+            raise Exception('Exist unrecognized dot-bracket notation pattern!')
+        col += 1
+
+    # 确认示意图正确性
+    assert(ind1==len1)
+    assert(ind2==len2)
+
+    return [''.join(line[:col]) for line in (line1, line2, line3, line4, line5)]
+
+
+def getAddSeq(full_seq, ind, part, seq_type):
+    '''生成interaction区域外部的序列示意图
+    格式为3个base+3省略号+5个base
+    part用于指示是5' head或3' tail区域
+    seq_tytpe用于指示是target RNA或query tRF
+    ind以**1**为起点
+    输入tRF并未反转
+    '''
+
+    if part == 'head':
+        # 5' head
+        # 判断是否需要省略号
+        if ind > 8:
+            add_seq = full_seq[:3] + '...' + full_seq[ind-6:ind-1]
+        else:
+            add_seq = full_seq[:ind-1]
+    else:
+        # 3' tail区域
+        # 首先判断是否需要省略号
+        if len(full_seq)-ind > 8:
+            add_seq = full_seq[ind:ind+5] + '...' + full_seq[-3:]
+        else:
+            add_seq = full_seq[ind:]
+
+    # 加上5'或3'标记
+    if seq_type == 'target':
+        if part == 'head':
+            return '5\'-'+add_seq
+        else:
+            return add_seq+'-3\''
+    else:
+        # 反转tRF
+        if part == 'head':
+            return add_seq[::-1]+'-5\''
+        else:
+            return '3\'-'+add_seq[::-1]
+
+
+def getNoteLine(start, end, len_pre, len_mid, len_suf, len_full, seq_type):
+    '''确定line2或line8，包括指示序列位置的'|'和空格
+    start和end以1为起点
+    '''
+    # 前缀
+    if seq_type == 'target':
+        # line2 for target, 5' head
+        if start == 1:
+            # interaction起始标记就是start
+            line = ' '*3
+        elif len_pre < 5:
+            # interaction外部序列<2，为避免1和2挨在一起，无需起始指示
+            line = ' '*len_pre
+        else:
+            line = ' '*3 + '|' + ' '*(len_pre-4)
+    else:
+        # line8 for query, 3' tail
+        if end == len_full:
+            # interaction终止就是序列end
+            line = ' '*3
+        elif len_pre < 6:
+            # interaction外部序列<3，为避免数字重叠，无需首尾指示
+            line = ' '*len_pre
+        else:
+            line = ' '*3 + '|' + ' '*(len_pre-4)
+
+    # 加上interaction段
+    line += ('|' + ' '*(len_mid-2) + '|')
+
+    # 后缀
+    if seq_type == 'target':
+        # line2 for target, 3' tail
+        # 如果interaction终止就是序列end，无需任何操作
+        if end == len_full:
+            line += ' '*3
+        elif len_suf < 10:
+            # interaction外部序列<7，为避免数字重叠，无需首尾指示
+            line += ' '*len_suf
+        else:
+            line += (' '*(len_suf-4) + '|' + ' '*3)
+    else:
+        # line8 for query, 5' head
+        # 如果interaction起点就是序列start，无需任何操作
+        if start == 1:
+            line += ' '*3
+        elif len_suf < 5:
+            # interaction外部序列<2，为避免1和2挨在一起，无需起始指示
+            line += ' '*len_suf
+        else:
+            line += (' '*(len_suf-4) + '|' + ' '*3)
+
+    return line
+
+
+def getNoteNum(line, start, end, len_full, seq_type):
+    '''根据line2或line8，'|'的位置
+    确定line1或line9，数字的位置
+    暂不考虑数字之间是否会出现间隔太小导致覆盖的问题
+    默认不会出现覆盖的现象
+    '''
+
+    # 确定line中'|'的位置
+    indices = []
+    ind = line.find('|')
+    while ind >= 0:
+        indices.append(ind)
+        ind = line.find('|', ind+1)
+    # 确定对应的数字
+    # 顺序为1, start, end, len_full
+    nums = [1, start, end, len_full]
+    if start == 1:
+        del nums[0]
+    if end == len_full:
+        del nums[-1]
+    # 如果此时nums仍然比竖线多，说明为避免数字重叠，序列首部或者末尾的指示被取消了
+    if start == 2:
+        del nums[0]
+
+    if len(nums) > len(indices):
+        del nums[-1]
+
+    assert(len(nums)==len(indices))
+
+    # query序列需要反向
+    if seq_type == 'query':
+        nums.reverse()
+
+    # 采用字符替换的方法确定输出
+    # 在index处，将同样长度的子字符串替换成数字，字符串长度不变
+    # 根据数字的长度进行自适应调整，使得数字在index处居中
+    # 不考虑溢出，即line在index处留下的空间小于数字的长度
+    new_line = line
+    for ind, num in zip(indices, nums):
+        num = str(num)
+        # index处之前需要被替换的字符数，即向前偏移量
+        pre_len = len(num) // 2
+        # index处会占用一个字符，index处之后的位置偏移量
+        suf_len = len(num) - pre_len
+        new_line = new_line[:ind-pre_len] + num + new_line[ind+suf_len:]
+    return new_line
+
+
+def getDemo(full_seq1, start1, end1, full_seq2, start2, end2, subseqDP, hybridDP):
+    '''生成interaction的plain text示意图
+    1是指target RNA
+    2是指query tRF
+    subseqDP是用'&'连接的interaction局部序列
+    hybridDP是用'&'连接的interaction局部匹配模式图(dot-bracket notation)
+    注意：1.start和end是以**1**为起点的，需要包含end，因此起止为[start1-1:end1]
+    2.匹配示意图为target在上，tRF在下，并且tRF需要进行反向(3'->5')
+    3.所有T变成U
+    '''
+
+    # 按'&'分隔target和tRF
+    sub_seq1, sub_seq2 = subseqDP.split('&')
+    sub_match1, sub_match2 = hybridDP.split('&')
+    # T变成U
+    tmp_full1 = full_seq1.replace('T', 'U')
+    sub_seq1 = sub_seq1.replace('T', 'U')
+    tmp_full2 = full_seq2.replace('T', 'U')
+    sub_seq2 = sub_seq2.replace('T', 'U')
+    len_full1 = len(tmp_full1)
+    len_full2 = len(tmp_full2)
+
+    # 构建interaction区域示意图，输入反转后的tRF
+    # 输出为line3-line7的中间部分
+    # interaction区域所有line长度一致
+    demo = getInteractDemo(sub_seq1, sub_seq2[::-1], sub_match1, sub_match2[::-1])
+    len_mid = len(demo[0])
+
+    # interaction前后的序列示意图
+    line3_pre = getAddSeq(tmp_full1, start1, 'head', 'target')
+    line3_suf = getAddSeq(tmp_full1, end1, 'tail', 'target')
+    line7_pre = getAddSeq(tmp_full2, end2, 'tail', 'query')
+    line7_suf = getAddSeq(tmp_full2, start2, 'head', 'query')
+
+    # 确定line2，即target位置标记的竖线位置
+    line2 = getNoteLine(start1, end1, len(line3_pre), len_mid,
+                        len(line3_suf), len_full1, 'target')
+    # 确定line1，即target的位置数字
+    line1 = getNoteNum(line2, start1, end1, len_full1, 'target')
+
+    # 确定line8，即query位置标记的竖线位置
+    line8 = getNoteLine(start2, end2, len(line7_pre), len_mid,
+                        len(line7_suf), len_full2, 'query')
+    # 确定line9，即query的位置数字
+    line9 = getNoteNum(line8, start2, end2, len_full2, 'query')
+
+    # 前缀序列补齐，后缀不齐不影响
+    # 看line3_pre和line7_pre谁长
+    diff = abs(len(line3_pre) - len(line7_pre))
+    if len(line3_pre) > len(line7_pre):
+        # line7,8,9前面需要补空格
+        line7_pre = ' '*(diff) + line7_pre
+        line8 = ' '*(diff) + line8
+        line9 = ' '*(diff) + line9
+    elif len(line3_pre) < len(line7_pre):
+        # line1,2,3前面需要补空格
+        line1 = ' '*(diff) + line1
+        line2 = ' '*(diff) + line2
+        line3_pre = ' '*(diff) + line3_pre
+
+    # 合并所有line
+    blank = ' '*len(line3_pre)
+    # interaction区域为line3-line7的中间部分
+    # 5'和3'标记可能加至不同的line上
+    # line3/4，前缀和后缀
+    if start1 == 1:
+        line3 = [blank, demo[0]]
+        line4 = [line3_pre, demo[1]]
+    else:
+        line3 = [line3_pre, demo[0]]
+        line4 = [blank, demo[1]]
+    if end1 == len_full1:
+        line4.append(line3_suf)
+    else:
+        line3.append(line3_suf)
+    # line5
+    line5 = blank + demo[2]
+    # line6/7，前缀和后缀
+    if end2 == len_full2:
+        line6 = [line7_pre, demo[3]]
+        line7 = [blank, demo[4]]
+    else:
+        line6 = [blank, demo[3]]
+        line7 = [line7_pre, demo[4]]
+    if start2 == 1:
+        line6.append(line7_suf)
+    else:
+        line7.append(line7_suf)
+
+    # 最后在line4和line6前面加上target和tRF字样，占8个字符
+    # 同时去除line1,2,8,9末尾存在的2个空格(对应的是3'和5'字符)
+    return '\n'.join([' '*8 + line1.rstrip(),
+                      ' '*8 + line2.rstrip(),
+                      ' '*8 + ''.join(line3).rstrip(),
+                      'target  ' + ''.join(line4).rstrip(),
+                      ' '*8 + line5.rstrip(),
+                      'tRF     ' + ''.join(line6).rstrip(),
+                      ' '*8 + ''.join(line7).rstrip(),
+                      ' '*8 + line8.rstrip(),
+                      ' '*8 + line9.rstrip()])
+
+
+def getMaxHitLen(demo):
+    '''给出一个匹配的示意图，找到连续匹配上的bases的最大长度
+    G-U不稳定匹配也认为是匹配
+    示意图共9行，其中第5行是匹配符号
+    '''
+    tmp = demo.split('\n')
+    matched = tmp[4].strip().split()
+    max_len = 0
+    for seq in matched:
+        if max_len < len(seq):
+            max_len = len(seq)
+    return max_len
+
+
+def getMaxHitDP(demo, max_len):
+    '''给出一个匹配的示意图，找到最长的连续匹配上的序列
+    G-U不稳定匹配也认为是匹配
+    示意图共9行，其中第5行是匹配符号
+    返回格式为target seq&query seq，并且二者都是5'->3'方向
+    max_len为最长的连续匹配长度
+    多个序列用'|'隔开
+    '''
+    tmp = demo.split('\n')
+    sub_seq = [seq for seq in tmp[4].strip().split() if len(seq)==max_len]
+    result = []
+
+    for seq in sub_seq:
+        # 确定序列在demo中的起始位置
+        index = tmp[4].index(seq)
+        # 用'&'连接target和query，并且query反向
+        result.append(tmp[3][index:index+max_len]+'&'+tmp[5][index:index+max_len][::-1])
+            
+    return '|'.join(result)
+
+
+def getHits(subseqDP, hybridDP):
+    '''直接从dot-bracket notation找到最长的连续匹配，无需生成示意图
+    与getInteractDemo相同的方式逐列扫描（tRF反转），连续的匹配列为一段连续匹配
+    返回(Max_Hit_Len, Max_Hit_DP)，与getMaxHitLen(getDemo(...))和getMaxHitDP的结果完全一致
+    '''
+
+    sub_seq1, sub_seq2 = subseqDP.split('&')
+    match1, match2 = hybridDP.split('&')
+    seq1 = sub_seq1.replace('T', 'U')
+    seq2 = sub_seq2.replace('T', 'U')[::-1]
+    match2 = match2[::-1]
+    len1 = len(seq1)
+    len2 = len(seq2)
+
+    # 每段连续匹配的匹配符号，target中的bases，tRF中的bases（反转后）
+    hits = []
+    symbols = []
+    bases1 = []
+    bases2 = []
+    ind1 = 0
+    ind2 = 0
+
+    while (ind1<len1) and (ind2<len2):
+        m1 = match1[ind1]
+        m2 = match2[ind2]
+        if m1 == '(' and m2 == ')':
+            # 匹配，延长当前的连续匹配
+            base1 = seq1[ind1]
+            base2 = seq2[ind2]
+            symbol = PAIR_SYMBOL.get(base1+base2)
+            if symbol is None:
+                raise Exception('Invalid complementary base pair "{}"-"{}"!'.format(base1, base2))
+            symbols.append(symbol)
+            bases1.append(base1)
+            bases2.append(base2)
+            ind1 += 1
+            ind2 += 1
+            continue
+        if m1 == '.' and m2 == '.':
+            ind1 += 1
+            ind2 += 1
+        elif m1 == '(' and m2 == '.':
+            ind2 += 1
+        elif m1 == '.' and m2 == ')':
+            ind1 += 1
+        else:
+            raise Exception('Exist unrecognized dot-bracket notation pattern!')
+        # 非匹配列，结束当前的连续匹配
+        if symbols:
+            hits.append((''.join(symbols), ''.join(bases1), ''.join(bases2)))
+            symbols = []
+            bases1 = []
+            bases2 = []
+    if symbols:
+        hits.append((''.join(symbols), ''.join(bases1), ''.join(bases2)))
+
+    # 确认dot-bracket notation的正确性
+    assert(ind1==len1)
+    assert(ind2==len2)
+
+    max_len = max((len(hit[0]) for hit in hits), default=0)
+    # getMaxHitDP按匹配符号在示意图中查找位置，匹配符号相同的多段连续匹配都对应第一段
+    first = {}
+    result = []
+    for hit in hits:
+        if len(hit[0]) == max_len:
+            hit = first.setdefault(hit[0], hit)
+            # 用'&'连接target和query，并且query反向
+            result.append(hit[1]+'&'+hit[2][::-1])
+
+    return max_len, '|'.join(result)
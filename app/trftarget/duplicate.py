@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+'''
+确认同一tRF和同一transcript的重复entries，RNAhybrid和IntaRNA的结果解析共用
+'''
+
+
+import numpy as np
+
+
+def checkDuplicate(dataframe):
+    '''检查所有记录，返回重复的、需要删除的entries的index
+    dataframe已经经过排序
+    重复的定义为：同一tRF和同一transcript的记录中，target起止位置在+/-8个base之内
+    (start相差<=8且end相差<=5，或start相差<=5且end相差<=8)
+    某条记录只要与排在它前面的任一记录重复，就需要删除，因此只保留energy最低的记录
+    Update: vectorized interval sweep instead of pairwise loop. Entries are sorted by
+    Start_Target within each (tRF, transcript) group, then entries lag=1,2,... apart are
+    compared with array operations until no pair falls in the +/-8 bases start window
+    '''
+    
+    n = dataframe.shape[0]
+    if n == 0:
+        return []
+    
+    # rank of each entry in the input order, lower rank is kept
+    rank = np.arange(n)
+    trf_ids = dataframe['tRF_ID'].to_numpy()
+    tran_ids = dataframe['Transcript_ID'].to_numpy()
+    # consecutive entries with the same tRF and transcript form one group
+    new_group = (trf_ids[1:] != trf_ids[:-1]) | (tran_ids[1:] != tran_ids[:-1])
+    group = np.concatenate(([0], np.cumsum(new_group)))
+    start = dataframe['Start_Target'].to_numpy(dtype=np.int64)
+    end = dataframe['End_Target'].to_numpy(dtype=np.int64)
+    
+    # sort by group, then Start_Target
+    order = np.lexsort((rank, start, group))
+    group = group[order]
+    start = start[order]
+    end = end[order]
+    rank = rank[order]
+    
+    is_dup = np.zeros(n, dtype=bool)
+    lag = 1
+    while lag < n:
+        # start difference is non-negative after sorting
+        diff_start = start[lag:] - start[:-lag]
+        in_window = (group[lag:] == group[:-lag]) & (diff_start <= 8)
+        # start differences only grow with lag, no more pairs to check
+        if not in_window.any():
+            break
+        diff_end = np.abs(end[lag:] - end[:-lag])
+        hit = in_window & (diff_end <= 8) & ((diff_start <= 5) | (diff_end <= 5))
+        # the entry ranked later in the pair is the duplicate
+        is_dup[np.maximum(rank[lag:], rank[:-lag])[hit]] = True
+        lag += 1
+    
+    return dataframe.index[is_dup].tolist()
@@ -0,0 +1,592 @@
+# -*- coding: utf-8 -*-
+'''
+Parse result from IntaRNA
+本次自定义程序，生成interaction的示意图。经过与IntaRNA画出的示意图进行比对，本人程序生成的示意图均正确
+Update: processing file in Chunk to reduce RAM consuming
+Update: output table can be saved in csv or parquet format
+Update: demos can be skipped, and rendered later by trftarget.render
+Update: inta_run calls IntaRNA, and can serve tRFs from a result cache so only new tRFs are run
+Update: wall time, CPU time, peak RSS and entries of each parsed chunk are saved as intarna_parse_metrics.json and .csv
+Update: transcript序列从序列库transcripts_seq（mmap读取）获取，不再读入transcripts_info建立dict
+Update: with the result cache, results are written tRF by tRF instead of being collected and sorted in memory
+'''
+
+
+import pandas as pd
+from tqdm import tqdm
+from math import ceil
+from time import time
+import os
+import numpy as np
+from multiprocessing import Pool
+from shutil import rmtree
+from subprocess import run, PIPE
+from .demo import getDemo, getHits
+from .duplicate import checkDuplicate
+from .table import getTableFile, findTable, readTable, encodeTable, TableWriter
+from .cache import ResultCache, fileDigest
+from .metrics import Meter, encodedSize, fileSize, saveReport
+from .seqstore import loadTranscripts
+
+
+# IntaRNA程序，需要在PATH中
+INTARNA = 'IntaRNA'
+
+# IntaRNA输出（--outMode=C）默认的header
+INTARNA_HEADER = 'id1;start1;end1;id2;start2;end2;subseqDP;hybridDP;E'
+
+# 拆分IntaRNA输出时，每个tRF积累的行数达到此数目即写入临时文件
+SPOOL_LINES = 10000
+
+
+# ---------------------调用IntaRNA相关函数---------------------------
+def readFasta(file_name):
+    '''返回fasta文件中的[(ID, 序列)]，ID为header中第一个空格前的部分，与Biopython的record.id一致
+    '''
+    records = []
+    with open(file_name, 'rt') as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith('>'):
+                records.append([line[1:].split(maxsplit=1)[0] if len(line) > 1 else '', ''])
+            elif line and records:
+                records[-1][1] += line
+    return [tuple(record) for record in records]
+
+
+def runIntaRNA(query_file, target_file, output_file, n_cores=1, seed_bp=6, n_sub=1, max_e=0):
+    '''调用IntaRNA，结果保存为output_file（';'分隔的CSV格式）
+    '''
+    run([INTARNA, '-q', query_file, '-t', target_file, '--threads={:d}'.format(n_cores), '--mode=H',
+         '--seedBP={:d}'.format(seed_bp), '-n', str(n_sub), '--outMode=C', '--out='+output_file,
+         '--outMaxE={:g}'.format(max_e), '--outOverlap=Q'], check=True)
+
+
+def splitOutput(output_file, trf_ids, directory):
+    '''按tRF ID把IntaRNA输出拆分为directory中每个tRF的临时文件（去掉tRF ID），同一tRF连续的行一次写入
+    IntaRNA输出的tRF ID不在trf_ids中时报错
+    返回header，以及每个tRF ID对应的临时文件名
+    '''
+    spool_files = {trf_id: os.path.join(directory, 'tRF_{:d}.csv'.format(k)) for k, trf_id in enumerate(trf_ids)}
+    for one_file in spool_files.values():
+        open(one_file, 'wt').close()
+    
+    def flush(trf_id, lines):
+        if len(lines) > 0:
+            with open(spool_files[trf_id], 'at') as out:
+                out.writelines(lines)
+    
+    with open(output_file, 'rt') as f:
+        header = f.readline().rstrip('\n')
+        if header == '':
+            # 没有任何输出
+            return header, spool_files
+        trf_col = header.split(';').index('id2')
+        current = None
+        lines = []
+        for line in f:
+            fields = line.rstrip('\n').split(';')
+            if fields[trf_col] != current:
+                flush(current, lines)
+                lines = []
+                current = fields[trf_col]
+                if current not in spool_files:
+                    raise Exception('tRF ID "{}" in IntaRNA output "{}" is not in the query file!'.format(
+                            current, output_file))
+            fields[trf_col] = ''
+            lines.append(';'.join(fields) + '\n')
+            if len(lines) >= SPOOL_LINES:
+                flush(current, lines)
+                lines = []
+        flush(current, lines)
+    return header, spool_files
+
+
+def inta_run(query_file, target_file, output_path, n_cores=1, seed_bp=6, n_sub=1, max_e=0, cache_dir=None, cache_size=None):
+    '''调用IntaRNA预测tRFs与transcripts的interaction，结果保存为output_path中的intarna_results.csv，再由inta_analysis解析
+    cache_dir不为None时，每个tRF的结果按(tRF序列，target文件，IntaRNA版本，参数)缓存，只对缓存中没有的tRFs运行IntaRNA
+    使用缓存时，结果按tRF顺序逐个写入（从缓存读取或由IntaRNA输出拆分得到），内存中只保留一个tRF的结果
+    parseIntaRNA.py解析时会重新排序，因此与单线程运行IntaRNA的顺序不同不影响结果
+    cache_size为缓存大小上限（bytes）
+    '''
+    intarna_file = os.path.join(output_path, 'intarna_results.csv')
+    if cache_dir is None:
+        runIntaRNA(query_file, target_file, intarna_file, n_cores, seed_bp, n_sub, max_e)
+        return True
+    
+    query_list = readFasta(query_file)
+    cache = ResultCache(cache_dir, cache_size)
+    version = run([INTARNA, '--version'], stdout=PIPE, check=True, universal_newlines=True).stdout.strip()
+    target_digest = fileDigest(target_file)
+    cache_keys = [cache.getKey('IntaRNA', seq, target_digest, version, seed_bp, n_sub, max_e)
+                  for _, seq in query_list]
+    # 缓存的结果为(header, 去掉tRF ID的各行)，此处只检查是否存在，写入结果文件时再逐个读取
+    todo = [i for i, key in enumerate(cache_keys) if not cache.contains(key)]
+    print('{:d} of {:d} tRFs found in cache "{}".'.format(len(query_list)-len(todo), len(query_list), cache_dir))
+    
+    tmp_dir = os.path.join(output_path, 'intarna_uncached')
+    spool_files = {}
+    new_header = ''
+    if len(todo) > 0:
+        # 只对缓存中没有的tRFs运行IntaRNA，按tRF ID拆分结果
+        os.makedirs(tmp_dir, exist_ok=True)
+        tmp_query_file = os.path.join(tmp_dir, 'tRFs.fasta')
+        tmp_output_file = os.path.join(tmp_dir, 'results.csv')
+        with open(tmp_query_file, 'wt') as f:
+            for i in todo:
+                f.write('>{}\n{}\n'.format(*query_list[i]))
+        runIntaRNA(tmp_query_file, target_file, tmp_output_file, n_cores, seed_bp, n_sub, max_e)
+        new_header, spool_files = splitOutput(tmp_output_file, [query_list[i][0] for i in todo], tmp_dir)
+        os.remove(tmp_output_file)
+    todo = set(todo)
+    
+    # 按tRF顺序逐个读取结果，存入缓存，恢复tRF ID后写入结果文件
+    header = None
+    with open(intarna_file, 'wt') as f:
+        for i, (trf_id, _) in enumerate(query_list):
+            result = cache.load(cache_keys[i])
+            if result is None:
+                if i not in todo:
+                    # 检查之后被共用缓存的其它任务淘汰
+                    raise Exception('Cached result of tRF "{}" was removed during the run, please run again!'.format(trf_id))
+                with open(spool_files[trf_id], 'rt') as spool:
+                    result = (new_header, [line.rstrip('\n') for line in spool])
+                cache.save(cache_keys[i], result)
+            if header is None and result[0] != '':
+                header = result[0]
+                f.write(header + '\n')
+            if len(result[1]) > 0:
+                trf_col = result[0].split(';').index('id2')
+                for line in result[1]:
+                    fields = line.split(';')
+                    fields[trf_col] = trf_id
+                    f.write(';'.join(fields) + '\n')
+        if header is None:
+            # 没有任何tRF的结果，只写入IntaRNA的默认header
+            f.write(INTARNA_HEADER + '\n')
+    
+    if len(todo) > 0:
+        rmtree(tmp_dir)
+    cache.report()
+    return True
+
+
+# ---------------------结果解析相关函数---------------------------
+def parseTranID(tran_id):
+    # 解析transcript的id，返回ENST编码和ENSG编码，不带版本号
+    # transcript的id号为'|'分隔的多个字符串
+    # 第1个为ENST编码，第2个为ENSG编码
+    # 版本号为'.'分隔
+    tmp_id = tran_id.strip().split('|')
+    # return tmp_id[0].split('.')[0], tmp_id[1].split('.')[0]
+    # 除human和mouse外，其余物种ENST和ENSG编码没有版本号
+    return tmp_id[0], tmp_id[1]
+
+
+def getArea(tran_id, start1):
+    '''根据interaction在mRNA上的**起始位置**，以及mRNA的区域起止说明
+    判断绑定点位于哪一个区域
+    '''
+    # 最后一个为空字符串，倒数2-4为'UTR5','CDS','UTR3'起止位置，但不一定3个部分都有
+    tmp_id = tran_id.strip().split('|')
+    tmp_part_dict = {}
+    for i in range(-2, -5, -1):
+        tmp_list = tmp_id[i].split(':')
+        if len(tmp_list) == 2:
+            tmp_part_dict[tmp_list[0]] = tmp_list[1]
+    tmp_pos = int(start1)
+    for k, v in tmp_part_dict.items():
+        # 分隔起止位置
+        tmp = v.split('-')
+        if tmp_pos>=int(tmp[0]) and tmp_pos<=int(tmp[1]):
+            return k
+
+
+# ---------------------解析intaRNA结果------------------------------
+# re-order columns to make sure the order is the same with RNAhybrid results
+# update: do not save p value
+cols = ['tRF_ID', 'Transcript_ID', 'MFE', 'Demo', 'Max_Hit_Len', 'Start_tRF', 'End_tRF', 'Start_Target', 'End_Target', 'Tool', 'HybridDP', 'SubseqDP', 'Max_Hit_DP']
+
+chunksize = 1e5
+
+# 解析时使用的序列信息，以及待解析的dataframe
+# 多进程时，子进程通过fork直接使用，无需复制
+rna_seq = None
+tRF_seq = None
+inta_result2 = None
+# 输出格式，以及是否生成示意图
+table_format = 'csv'
+with_demo = True
+
+
+def initParse(rna_seq_dict, trf_seq_dict, dataframe=None, file_format='csv', demo=True):
+    '''设置解析时使用的全局变量
+    需要在创建进程池之前调用
+    '''
+    global rna_seq, tRF_seq, inta_result2, table_format, with_demo
+    rna_seq = rna_seq_dict
+    tRF_seq = trf_seq_dict
+    inta_result2 = dataframe
+    table_format = file_format
+    with_demo = demo
+
+
+def renameColumns(dataframe):
+    '''IntaRNA结果的列名重命名
+    '''
+    dataframe.rename(columns={'hybridDP': 'HybridDP', 'subseqDP': 'SubseqDP',
+                         'id2': 'tRF_ID', 'id1': 'Transcript_ID', 'E': 'MFE',
+                         'start1': 'Start_Target', 'end1': 'End_Target',
+                         'start2': 'Start_tRF', 'end2': 'End_tRF'}, inplace=True)
+    return dataframe
+
+
+def addColumns(dataframe):
+    '''增加需要的新信息
+    '''
+    # 注意：empty string不是null
+    dataframe['Max_Hit_Len'] = np.nan
+    dataframe['Demo'] = ''
+    dataframe['Max_Hit_DP'] = ''
+    dataframe['P_Val'] = np.nan
+    # 增加Tool
+    dataframe['Tool'] = 'IntaRNA'
+    return dataframe
+
+
+def parseEntries(tmp_df, name=''):
+    '''解析获得其余的features，返回不含header的CSV格式的字符串（Parquet格式时为arrow table），以及名为name的运行统计
+    tmp_df需要是独立的dataframe，而不是大dataframe的view
+    Max_Hit_Len和Max_Hit_DP直接从dot-bracket notation得到，无需从示意图中查找
+    不生成示意图时，Demo column留空
+    '''
+    meter = Meter()
+    
+    for i in tmp_df.index:
+    
+        tmp_df.at[i, 'Max_Hit_Len'], tmp_df.at[i, 'Max_Hit_DP'] = getHits(tmp_df.at[i, 'SubseqDP'], tmp_df.at[i, 'HybridDP'])
+        
+        if with_demo:
+            tmp_df.at[i, 'Demo'] = getDemo(rna_seq[tmp_df.at[i, 'Transcript_ID'].strip()],
+                                           tmp_df.at[i, 'Start_Target'], tmp_df.at[i, 'End_Target'],
+                                           tRF_seq[tmp_df.at[i, 'tRF_ID'].strip()],
+                                           tmp_df.at[i, 'Start_tRF'], tmp_df.at[i, 'End_tRF'],
+                                           tmp_df.at[i, 'SubseqDP'], tmp_df.at[i, 'HybridDP'])
+    
+    encoded = encodeTable(tmp_df, cols, table_format)
+    return encoded, meter.record('IntaRNA parse', name, Entries_In=tmp_df.shape[0], Entries_Kept=tmp_df.shape[0],
+                                 Bytes_Written=encodedSize(encoded))
+
+
+def parseChunk(chunk_i):
+    '''解析第chunk_i个chunk，返回parseEntries的结果
+    多进程时，子进程通过fork直接使用inta_result2，rna_seq和tRF_seq，无需复制
+    '''
+    
+    # make a DEEP copy of current processing DataFrame to make it independent from the whole large DataFrame
+    # otherwise the generated new features will still be saved into the whole large since the sub DataFrame is only a reference or view of the initial DataFrame, then the RAM consumed by the whole DataFrame will still increase along with processing, even delete the sub dataframe CAN NOT free the RAM
+    # Python use Garbageg Collector to release unreferenced memory ONLY when this object isn't referenced by anything
+    tmp_df = inta_result2.iloc[int(chunk_i*chunksize):int((chunk_i+1)*chunksize), :].copy()
+    
+    return parseEntries(tmp_df, 'chunk_{:d}'.format(chunk_i))
+
+
+def sortRuns(intarna_file, directory):
+    '''分块读取IntaRNA结果，每块按(tRF_ID, Transcript_ID, MFE)排序后保存为临时文件
+    返回所有临时文件名
+    '''
+    runs = []
+    for ind, chunk in enumerate(pd.read_csv(intarna_file, sep=';', dtype={'id1': str, 'id2': str},
+                                            chunksize=int(chunksize))):
+        if chunk.shape[0] == 0:
+            continue
+        renameColumns(chunk)
+        # stable sort, entries with the same MFE keep the order in IntaRNA output
+        chunk.sort_values(['tRF_ID', 'Transcript_ID', 'MFE'], kind='mergesort', inplace=True)
+        run_file = os.path.join(directory, 'run_{:d}.csv'.format(ind))
+        chunk.to_csv(run_file, index=False)
+        runs.append(run_file)
+    return runs
+
+
+def mergeRuns(runs):
+    '''分块读取所有已排序的临时文件，进行多路归并
+    每次返回一个按(tRF_ID, Transcript_ID, MFE)排序的dataframe，并且其中每个tRF和transcript的记录都是完整的
+    所有临时文件同时读入内存的entries数目约为chunksize
+    '''
+    
+    def lessThan(dataframe, key):
+        '''返回(tRF_ID, Transcript_ID)小于key的rows
+        '''
+        return (dataframe['tRF_ID'] < key[0]) | ((dataframe['tRF_ID'] == key[0]) & (dataframe['Transcript_ID'] < key[1]))
+    
+    def lastKey(dataframe):
+        return dataframe['tRF_ID'].iat[-1], dataframe['Transcript_ID'].iat[-1]
+    
+    block_size = max(1000, int(chunksize) // max(1, len(runs)))
+    readers = [pd.read_csv(one_file, dtype={'tRF_ID': str, 'Transcript_ID': str}, chunksize=block_size)
+               for one_file in runs]
+    buffers = [next(reader, None) for reader in readers]
+    # 是否已读完
+    finished = [buffer is None for buffer in buffers]
+    
+    while True:
+        # 未读完的文件中，最后一条记录之前的tRF和transcript已经完整
+        pending = [i for i in range(len(runs)) if not finished[i]]
+        threshold = min(lastKey(buffers[i]) for i in pending) if pending else None
+        
+        parts = []
+        for i in range(len(runs)):
+            if buffers[i] is None or buffers[i].shape[0] == 0:
+                continue
+            if threshold is None:
+                parts.append(buffers[i])
+                buffers[i] = None
+            else:
+                mask = lessThan(buffers[i], threshold)
+                parts.append(buffers[i][mask])
+                buffers[i] = buffers[i][~mask]
+        
+        if len(parts) > 0:
+            output = pd.concat(parts, ignore_index=True)
+            if output.shape[0] > 0:
+                yield output.sort_values(['tRF_ID', 'Transcript_ID', 'MFE'], kind='mergesort')
+        
+        if threshold is None:
+            break
+        
+        # 最后一条记录等于threshold的文件，需要继续读入
+        for i in pending:
+            if lastKey(buffers[i]) == threshold:
+                tmp = next(readers[i], None)
+                if tmp is None:
+                    finished[i] = True
+                else:
+                    buffers[i] = pd.concat([buffers[i], tmp], ignore_index=True)
+
+
+def inta_analysis(output_path, n_cores=1, streaming=False, file_format='csv', demo=True):
+    '''解析output_path中的IntaRNA结果intarna_results.csv，结果保存为parsed_intarna_results.csv（或.parquet）
+    需要同一文件夹下的trfs_info和transcripts_info（CSV或Parquet格式）提供序列信息
+    demo为False时不生成示意图，之后可由trftarget.render按需生成
+    每个chunk的运行统计保存为intarna_parse_metrics.json和intarna_parse_metrics.csv
+    '''
+    meter = Meter(children=True)
+    # 每个chunk的运行统计
+    records = []
+    
+    # ---------------------Needed Files------------------------------
+    intarna_file = os.path.join(output_path, 'intarna_results.csv')
+    trf_info_file = findTable(output_path, 'trfs_info')
+    tran_info_file = findTable(output_path, 'transcripts_info')
+    output_file = getTableFile(output_path, 'parsed_intarna_results', file_format)
+    
+    
+    # ---------------------准备附加信息------------------------------
+
+    # 1.tRF信息，用tRF ID索引
+    # 读取csv文件，并保存成dict格式，并且'T'变成'U
+    tmp_data = readTable(trf_info_file, dtype={'tRF_ID': str})
+    tRF_seq = {}
+    for i in tmp_data.index:
+        tRF_seq[tmp_data.at[i, 'tRF_ID']] = tmp_data.at[i, 'tRF_Seq'].replace('T', 'U')
+    print('Total {:,} tRF sequences'.format(len(tRF_seq)))
+    del tmp_data
+
+
+    # 2.gene symbol信息dict gene_symbol，用gene ensembl id索引
+    # skipped
+ 
+
+    # 3.transcript type和name信息rna_infos，用transcript ensembl id索引
+    # skipped
+
+
+    # 4.transcript 序列信息rna_seq，用transcript ensembl id索引
+    # 使用callRNAhybrid.py保存的序列库（'T'已变成'U'），没有时从transcripts_info生成，用法与dict相同
+    rna_seq = loadTranscripts(output_path, tran_info_file)
+    print('Total {:,} transcripts'.format(len(rna_seq)))
+
+
+    if not streaming:
+        # 读入CSV文件
+        start_time = time()
+        load_meter = Meter()
+        inta_result = pd.read_csv(intarna_file, sep=';', dtype={'id1': str, 'id2': str})
+        print('All entries loaded. Elapsed time: {:.2f} minutes'.format(
+                (time()-start_time)/60.0))
+    
+        # 需要增加的新信息
+        addColumns(inta_result)
+            
+        # 列名重命名
+        renameColumns(inta_result)
+    
+        # inta_result.info(memory_usage='deep') # dataframe占用内存
+    
+    
+        # 确认重复entries
+        # 对所有entries进行排序
+        start_time = time()
+        inta_result.sort_values(['tRF_ID', 'Transcript_ID', 'MFE'],
+                                ascending=[True, True, True], inplace=True)
+    
+        # When index is unique, pandas use a hashtable to map key to value O(1)
+        # When index is non-unique and sorted, pandas use binary search O(logN)
+        # When index is non-unique and non-sorted, pandas need to check all the keys in the index O(N)
+        print('Sorting dataframe completed. Elapsed time: {:.2f} hours'.format((time()-start_time)/3600.0))
+    
+        # 获得重复entries index的list
+        print('Begin checking duplicates')
+        start_time = time()
+        to_del = checkDuplicate(inta_result)
+        print('Total {:,} duplicates need to be deleted'.format(len(to_del)))
+        n_total = inta_result.shape[0]
+        n_dup = len(to_del)
+    
+        '''
+        # 删除重复entries by index
+        if len(to_del) > 0:
+            inta_result.drop(to_del, inplace=True)
+        '''
+    
+        # drop大量rows会非常慢
+        # 反过来从中抽取需要的rows
+        if len(to_del) > 0:
+            need_iloc = []
+            to_del_set = set(to_del)
+    
+            for i in inta_result.index:
+                if i in to_del_set:
+                    need_iloc.append(False)
+                else:
+                    need_iloc.append(True)
+    
+            inta_result2 = inta_result.iloc[need_iloc]
+        else:
+            inta_result2 = inta_result
+        initParse(rna_seq, tRF_seq, inta_result2, file_format, demo)
+    
+        # Remain entries
+        print('Remain {:,} entries after delete duplicated entries'.format(inta_result2.shape[0]))
+        print('Elapsed time: {:.2f} hours'.format((time()-start_time)/3600.0))
+        records.append(load_meter.record('IntaRNA parse', 'load and check duplicates', Entries_In=n_total,
+                                         Entries_Kept=inta_result2.shape[0], Duplicates_Removed=n_dup))
+    
+        del inta_result, to_del
+        if 'to_del_set' in locals():
+            del to_del_set, need_iloc
+    
+        # inta_result2.info(memory_usage='deep') # dataframe占用内存
+    
+    
+        # 解析获得其余的features
+        # process in batch
+        print('Start parsing the intaRNA result to get the rest features in Chunk...')
+    
+        count = ceil(inta_result2.shape[0] / chunksize)
+    
+        # 按顺序保存各chunk
+        with TableWriter(output_file, cols) as f:
+            if n_cores > 1:
+                print('{:d} CPUs will be used for parsing.'.format(n_cores))
+                pool = Pool(n_cores)
+                # imap keeps the order of chunks, each process handles one chunk at a time
+                for encoded, record in tqdm(pool.imap(parseChunk, range(count)), total=count):
+                    f.write(encoded)
+                    records.append(record)
+                pool.close()
+                pool.join()
+            else:
+                for chunk_i in tqdm(range(count)):
+                    encoded, record = parseChunk(chunk_i)
+                    f.write(encoded)
+                    records.append(record)
+        
+        # inta_result2.info(memory_usage='deep') # dataframe占用内存
+
+    else:
+        initParse(rna_seq, tRF_seq, file_format=file_format, demo=demo)
+        # streaming mode: external merge sort on disk, then check duplicates and parse
+        # each batch of complete tRF and transcript groups, so RAM is bounded by chunksize
+        directory = os.path.join(output_path, 'IntaRNA_tmp_files')
+        if os.path.isdir(directory):
+            rmtree(directory)
+            print('WARNING: directory "{}" removed!'.format(directory))
+        os.mkdir(directory)
+    
+        start_time = time()
+        sort_meter = Meter()
+        runs = sortRuns(intarna_file, directory)
+        print('Entries sorted into {:d} temporary files. Elapsed time: {:.2f} hours'.format(
+                len(runs), (time()-start_time)/3600.0))
+        records.append(sort_meter.record('IntaRNA parse', 'sort runs', Bytes_Written=sum(fileSize(run) for run in runs)))
+    
+        print('Start checking duplicates and parsing the intaRNA result in Chunk...')
+        if n_cores > 1:
+            print('{:d} CPUs will be used for parsing.'.format(n_cores))
+            pool = Pool(n_cores)
+    
+        n_total = 0
+        n_dup = 0
+        n_batch = 0
+        # 正在解析的chunks，数目有上限以限制RAM
+        pending = []
+        with TableWriter(output_file, cols) as f:
+        
+            def writeParsed(parsed):
+                encoded, record = parsed
+                f.write(encoded)
+                records.append(record)
+        
+            def parseBatch(batch):
+                '''check duplicates of a batch, then parse it or send it to the process pool'''
+                nonlocal n_dup, n_batch
+                batch = pd.concat(batch, ignore_index=True)
+                to_del = checkDuplicate(batch)
+                n_dup += len(to_del)
+                batch = addColumns(batch.drop(to_del))
+                name = 'batch_{:d}'.format(n_batch)
+                n_batch += 1
+                if n_cores > 1:
+                    pending.append(pool.apply_async(parseEntries, (batch, name)))
+                    # 按顺序写入已完成的chunks
+                    while len(pending) > 2*n_cores or (len(pending) > 0 and pending[0].ready()):
+                        writeParsed(pending.pop(0).get())
+                else:
+                    writeParsed(parseEntries(batch, name))
+        
+            batch = []
+            batch_len = 0
+            for block in tqdm(mergeRuns(runs)):
+                n_total += block.shape[0]
+                batch.append(block)
+                batch_len += block.shape[0]
+                if batch_len >= chunksize:
+                    parseBatch(batch)
+                    batch = []
+                    batch_len = 0
+            if batch_len > 0:
+                parseBatch(batch)
+        
+            for one_result in pending:
+                writeParsed(one_result.get())
+    
+        if n_cores > 1:
+            pool.close()
+            pool.join()
+    
+        print('Total {:,} entries, {:,} duplicates deleted'.format(n_total, n_dup))
+    
+        rmtree(directory)
+        print('WARNING: temporary directory "{}" removed!'.format(directory))
+    
+    # 释放全局变量
+    initParse(None, None)
+    
+    print('parsed results saved to file {}!'.format(output_file))
+    
+    # 运行统计存入JSON和CSV文件
+    saveReport(output_path, 'IntaRNA parse', records, meter.record('IntaRNA parse', 'total',
+               Entries_In=n_total, Entries_Kept=n_total-n_dup,
+               Duplicates_Removed=n_dup, Bytes_Written=fileSize(output_file)))
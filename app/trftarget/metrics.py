@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+'''
+运行统计：每个job的wall time，CPU time，peak RSS，entries数目和写入的bytes
+各stage（RNAhybrid，IntaRNA解析，consensus）的统计保存为output_path中的<stage>_metrics.json和<stage>_metrics.csv
+每个job一行，最后一行（Job为total）为整个stage的统计
+Peak_RSS_MB为每个job（或stage）运行期间的peak RSS：开始时将/proc/self/status中的VmHWM重置为当前RSS（Linux 4.0以上）
+进程池的子进程依次运行多个jobs时，每个job的峰值互不影响；无法重置时（例如不是Linux）为进程启动以来的最大值
+'''
+
+
+import os
+import json
+import resource
+import weakref
+from time import time
+from datetime import datetime, timezone
+import pandas as pd
+
+
+# run report的columns
+COLUMNS = ['Stage', 'Job', 'UTC_Time', 'Wall_Seconds', 'CPU_Seconds', 'Peak_RSS_MB',
+           'Entries_In', 'Entries_Kept', 'Duplicates_Removed', 'Bytes_Written']
+
+# 数目columns
+COUNT_COLUMNS = COLUMNS[-4:]
+
+
+# 正在测量的Meters，重置VmHWM之前将当前的峰值计入它们，嵌套的Meters互不影响
+active_meters = weakref.WeakSet()
+
+
+def rusageMB(usage):
+    '''ru_maxrss在Linux中单位为KB
+    '''
+    return usage.ru_maxrss / 1024.0
+
+
+def readHWM():
+    '''返回/proc/self/status中的VmHWM（MB），即上次重置以来的peak RSS，无法读取时返回None
+    '''
+    try:
+        with open('/proc/self/status', 'rt') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024.0
+    except OSError:
+        pass
+    return None
+
+
+def resetHWM():
+    '''将VmHWM重置为当前RSS（/proc/self/clear_refs写入5），成功时返回True
+    '''
+    hwm = readHWM()
+    if hwm is None:
+        return False
+    for meter in list(active_meters):
+        meter.peak = max(meter.peak, hwm)
+    try:
+        with open('/proc/self/clear_refs', 'wt') as f:
+            f.write('5')
+    except OSError:
+        return False
+    return True
+
+
+class Meter:
+    '''测量一段代码的wall time和CPU time，以及进程的peak RSS
+    children为True时包括已结束（已被wait）的子进程，例如进程池的子进程和它们调用的RNAhybrid
+    peak RSS为创建以来本进程的最大值，children为True时还包括子进程的最大值
+    '''
+
+    def __init__(self, children=False):
+        self.children = children
+        self.start_wall = time()
+        self.start_cpu = self.cpuTime()
+        # 无法重置VmHWM时，使用进程启动以来的最大值
+        self.since_start = not resetHWM()
+        # 创建之后，其它Meter重置VmHWM之前的峰值
+        self.peak = 0.0
+        active_meters.add(self)
+
+    def cpuTime(self):
+        usage = os.times()
+        cpu = usage.user + usage.system
+        if self.children:
+            cpu += usage.children_user + usage.children_system
+        return cpu
+
+    def peakRSS(self):
+        hwm = None if self.since_start else readHWM()
+        if hwm is None:
+            rss = rusageMB(resource.getrusage(resource.RUSAGE_SELF))
+        else:
+            rss = max(self.peak, hwm)
+        if self.children:
+            rss = max(rss, rusageMB(resource.getrusage(resource.RUSAGE_CHILDREN)))
+        return rss
+
+    def record(self, stage, job, **counts):
+        '''返回从创建至今的统计，counts为Entries_In等数目
+        '''
+        one_record = {'Stage': stage, 'Job': job,
+                      'UTC_Time': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+                      'Wall_Seconds': round(time() - self.start_wall, 3),
+                      'CPU_Seconds': round(self.cpuTime() - self.start_cpu, 3),
+                      'Peak_RSS_MB': round(self.peakRSS(), 1)}
+        one_record.update({k: int(v) for k, v in counts.items()})
+        return one_record
+
+
+def encodedSize(data):
+    '''encodeTable结果的bytes：CSV字符串的长度，或arrow table（未压缩）的大小
+    '''
+    if isinstance(data, str):
+        return len(data.encode('utf-8'))
+    return data.nbytes
+
+
+def fileSize(file_name):
+    return os.path.getsize(file_name) if os.path.isfile(file_name) else 0
+
+
+def saveReport(output_path, stage, records, total):
+    '''保存stage的run report，records为每个job的统计，total为整个stage的统计
+    '''
+    name = stage.lower().replace(' ', '_')
+    with open(os.path.join(output_path, name + '_metrics.json'), 'wt') as f:
+        json.dump({'stage': stage, 'total': total, 'jobs': records}, f, indent=2)
+    # 不适用的数目留空，其余保存为整数
+    pd.DataFrame(records + [total], columns=COLUMNS).astype({one_col: 'Int64' for one_col in COUNT_COLUMNS}).to_csv(
+            os.path.join(output_path, name + '_metrics.csv'), index=False)
+    print('Run report saved to "{}" (.json and .csv)'.format(os.path.join(output_path, name + '_metrics')))
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+'''
+用cProfile分析一个stage（RNAhybrid，IntaRNA解析，consensus等）的耗时，包括进程池的子进程
+主进程和每个子进程的profile分别保存为output_path/profiles/<stage>_<main或worker>_<pid>.prof
+子进程由multiprocessing以fork方式创建后开始profile，正常结束时（进程池close和join）保存
+stage结束后所有profiles合并为<stage>_merged.prof，以及按函数本身耗时（tottime）和累计耗时（cumulative）排序的<stage>_profile.txt
+'''
+
+
+import os
+import sys
+import glob
+import cProfile
+import pstats
+from contextlib import contextmanager
+from multiprocessing import util
+
+
+# profile文件夹
+PROFILE_DIR = 'profiles'
+
+# 汇总中列出的函数数目
+N_TOP = 40
+
+# 运行结束时打印的函数数目
+N_PRINT = 15
+
+
+class StageProfiler:
+    '''profile一个stage的主进程，以及在此期间fork创建的所有子进程
+    '''
+
+    def __init__(self, output_path, stage):
+        self.directory = os.path.join(output_path, PROFILE_DIR)
+        self.stage = stage
+        self.name = stage.lower().replace(' ', '_')
+        self.profiler = None
+        self.active = False
+
+    def getFile(self, role):
+        return os.path.join(self.directory, '{}_{}_{:d}.prof'.format(self.name, role, os.getpid()))
+
+    def start(self):
+        '''删除同一stage之前运行的profiles，开始profile主进程
+        '''
+        os.makedirs(self.directory, exist_ok=True)
+        for old_file in glob.glob(os.path.join(self.directory, self.name + '_*.prof')):
+            os.remove(old_file)
+        self.active = True
+        # multiprocessing创建的子进程启动时调用startWorker
+        util.register_after_fork(self, StageProfiler.startWorker)
+        self.profiler = cProfile.Profile()
+        self.profiler.enable()
+
+    def startWorker(self):
+        '''在fork创建的子进程中执行：停止从主进程继承的profiler，重新开始profile
+        子进程结束时由multiprocessing的finalizer保存
+        '''
+        self.profiler.disable()
+        if not self.active:
+            return
+        self.profiler = cProfile.Profile()
+        util.Finalize(None, self.save, args=('worker',), exitpriority=100)
+        self.profiler.enable()
+
+    def save(self, role):
+        self.profiler.disable()
+        self.profiler.dump_stats(self.getFile(role))
+
+    def stop(self):
+        '''保存主进程的profile，合并所有profiles
+        之后创建的子进程不再profile
+        '''
+        self.save('main')
+        self.active = False
+        return self.summarize()
+
+    def summarize(self):
+        '''合并主进程和所有子进程的profiles，同一函数在各进程中的耗时相加
+        '''
+        files = sorted(glob.glob(os.path.join(self.directory, self.name + '_*_*.prof')))
+        summary_file = os.path.join(self.directory, self.name + '_profile.txt')
+        with open(summary_file, 'wt') as f:
+            f.write('Profile of stage "{}" merged from {:d} processes:\n'.format(self.stage, len(files)))
+            for one_file in files:
+                f.write('{}\n'.format(os.path.basename(one_file)))
+            stats = pstats.Stats(*files, stream=f)
+            stats.dump_stats(os.path.join(self.directory, self.name + '_merged.prof'))
+            stats.strip_dirs()
+            stats.sort_stats('tottime').print_stats(N_TOP)
+            stats.sort_stats('cumulative').print_stats(N_TOP)
+
+        print('----------------------------------')
+        print('Hot functions of stage "{}" ({:d} processes, sorted by time spent in the function itself):'.format(
+                self.stage, len(files)))
+        sys.stdout.flush()
+        stats.stream = sys.stdout
+        stats.sort_stats('tottime').print_stats(N_PRINT)
+        print('Profiles saved in "{}", summary in "{}"'.format(self.directory, summary_file))
+        return stats
+
+
+@contextmanager
+def profileStage(output_path, stage, enabled=True):
+    '''with语句中的代码为一个stage，enabled为False时不做任何事
+    '''
+    if not enabled:
+        yield None
+        return
+    profiler = StageProfiler(output_path, stage)
+    profiler.start()
+    try:
+        yield profiler
+    finally:
+        profiler.stop()
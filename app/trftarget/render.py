@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+'''
+按需生成interaction示意图（Demo column）
+callRNAhybrid.py和parseIntaRNA.py使用-w选项时，结果中只保存坐标，HybridDP和SubseqDP，Demo column留空
+之后只对筛选出的entries生成示意图，结果与直接生成的示意图完全一致
+'''
+
+
+import os
+from tqdm import tqdm
+from .demo import getDemo
+from .table import findTable, readTable, iterTable, readColumns, TableWriter
+from .seqstore import loadTranscripts
+
+
+# 每次读入的entries数目
+chunksize = 1e5
+
+
+def loadSequences(info_path):
+    '''读取info_path中的trfs_info和transcripts_info（CSV或Parquet格式）
+    返回tRF序列的dict和transcript序列库（用法与dict相同），并且'T'变成'U'
+    '''
+    tmp_data = readTable(findTable(info_path, 'trfs_info'), dtype={'tRF_ID': str})
+    trf_seq = dict(zip(tmp_data['tRF_ID'], tmp_data['tRF_Seq'].str.replace('T', 'U')))
+    tran_seq = loadTranscripts(info_path, findTable(info_path, 'transcripts_info'))
+    return trf_seq, tran_seq
+
+
+def selectEntries(dataframe, trf_ids=None, tran_ids=None, mfe=None, mcl=None):
+    '''筛选entries，返回bool mask
+    trf_ids和tran_ids为需要的tRF和transcript ID，mfe为MFE上限，mcl为Max_Hit_Len下限，None表示不筛选
+    '''
+    mask = dataframe['tRF_ID'].notna()
+    if trf_ids is not None:
+        mask &= dataframe['tRF_ID'].isin(trf_ids)
+    if tran_ids is not None:
+        mask &= dataframe['Transcript_ID'].isin(tran_ids)
+    if mfe is not None:
+        mask &= dataframe['MFE'] <= mfe
+    if mcl is not None:
+        mask &= dataframe['Max_Hit_Len'] >= mcl
+    return mask
+
+
+def renderDemos(dataframe, trf_seq, tran_seq):
+    '''为dataframe中的所有entries生成示意图，返回加上Demo column的dataframe
+    '''
+    dataframe = dataframe.copy()
+    dataframe['Demo'] = [getDemo(tran_seq[tran_id], int(start1), int(end1), trf_seq[trf_id], int(start2), int(end2), subseq, hybrid)
+                         for trf_id, tran_id, start1, end1, start2, end2, subseq, hybrid in zip(
+                                 dataframe['tRF_ID'], dataframe['Transcript_ID'],
+                                 dataframe['Start_Target'], dataframe['End_Target'],
+                                 dataframe['Start_tRF'], dataframe['End_tRF'],
+                                 dataframe['SubseqDP'], dataframe['HybridDP'])]
+    return dataframe
+
+
+def render_analysis(result_file, output_file, info_path=None, trf_ids=None, tran_ids=None, mfe=None, mcl=None):
+    '''分块读入result_file（RNAhybrid，IntaRNA或consensus结果），筛选entries并生成示意图
+    结果保存为output_file，格式由扩展名决定，columns与result_file一致
+    info_path为trfs_info和transcripts_info所在的文件夹，默认为result_file所在的文件夹
+    返回输出的entries数目
+    '''
+    if os.path.realpath(result_file) == os.path.realpath(output_file):
+        raise Exception('Output file can not be the same as the input file "{}"!'.format(result_file))
+    if info_path is None:
+        info_path = os.path.dirname(os.path.realpath(result_file))
+    trf_seq, tran_seq = loadSequences(info_path)
+
+    n_total = 0
+    n_selected = 0
+    with TableWriter(output_file, readColumns(result_file)) as writer:
+        for chunk in tqdm(iterTable(result_file, int(chunksize), dtype={'tRF_ID': str, 'Transcript_ID': str})):
+            n_total += chunk.shape[0]
+            chunk = chunk[selectEntries(chunk, trf_ids, tran_ids, mfe, mcl)]
+            n_selected += chunk.shape[0]
+            writer.write(renderDemos(chunk, trf_seq, tran_seq))
+
+    print('Total {:,} entries, {:,} entries selected and rendered'.format(n_total, n_selected))
+    return n_selected
@@ -0,0 +1,812 @@
+# -*- coding: utf-8 -*-
+'''
+多进程调用RNAhybrid程序，完成tRFs至mRNAs的绑定位置预测
+多进程验证：5进程同时运行tRF 1001数据，结果与bash命令单进程结果逐行比较，结果完全一致，验证通过！
+1) 删除所有数据库操作，数据先保存为CSV文件
+2) 添加额外的解析函数，一次性将RNAhybrid结果转换成能存入MySQL数据库的格式
+3) 一些附件信息文件改用json格式
+4) 增加Tool，Gene_Evi和Site_Evi column
+5) 删除所有的transcript ID和Name解析，直接输出transcript FASTA文件中的ID
+输入：tRFs和transcripts序列
+输出：1) trfs_infos.csv：tRFs序列信息
+2) transcripts_infos.csv：transcripts序列信息
+3) rnahybrid_metrics.json和rnahybrid_metrics.csv：每个job的耗时，CPU time，peak RSS和entries数目
+4) rnahybrid_result.csv：解析后的binding interaction entries
+Update: tRF序列直接作为RNAhybrid的参数，解析结果通过进程间的pipe传递，不再为每个tRF保存fasta文件和中间CSV文件
+只有切分target fasta文件时才需要临时文件夹
+Update: 按cost model将多个tRFs合为一组，一次调用RNAhybrid（多序列query文件），解析结果按tRF_ID拆分后再合并
+Update: transcript序列保存为输出路径中的序列库transcripts_seq（mmap读取），不再建立dict，进程池的子进程共享
+'''
+
+
+import os
+import json
+from shutil import rmtree
+from time import time
+from Bio import SeqIO
+from multiprocessing import Pool, cpu_count
+from functools import partial
+from subprocess import Popen, PIPE, CalledProcessError
+import pandas as pd
+import numpy as np
+from .demo import getDemo, getHits
+from .duplicate import checkDuplicate
+from .table import getTableFile, writeTable, encodeTable, TableWriter
+from .cache import ResultCache, fileDigest
+from .metrics import Meter, rusageMB, encodedSize, fileSize, saveReport
+from .seqstore import SeqStore, SeqStoreWriter, getStorePrefix
+
+
+# RNAhybrid可执行文件
+RNAHYBRID = '/app/RNAhybrid'
+
+# 每次调用RNAhybrid的固定开销（启动，读入并解析target fasta文件），相当于多少个query bases的计算量
+# 实测：长度为1的query耗时约为20nt tRF每个base平均耗时的5%
+CALL_OVERHEAD = 0.05
+
+# 逐块写入transcripts_info时，每块的transcripts数目
+INFO_CHUNK_SIZE = 10000
+
+
+# ---------------------解析RNAhybrid图示-------------------------------
+def parseDemo(demo):
+    '''解析RNAhybrid的interaction图示
+    返回VRNA dot-bracket notation (interaction sites only)
+    返回格式为target seq&query seq，并且二者都是5'->3'方向
+    '''
+    
+    def getBindOnly(seq, note, marker):
+        '''只返回interaction区域
+        marker为'('或者')'
+        '''
+        start = note.find(marker)
+        stop = note.rfind(marker)
+        return seq[start:stop+1], note[start:stop+1]
+    
+    # demo可分为4行，长度都相等
+    # 第1和2行属于target，第3和4行属于query
+    lines = demo.split('\n')
+    
+    target_seq = ''
+    query_seq = ''
+    target_note = ''
+    query_note = ''
+    
+    # 前面9个字符为无用字符"target 5'"和"tRF 3‘"
+    # 后面2个字符为无用字符"3'"和"5'"
+    for i in range(9, len(lines[0])-2):
+        if lines[0][i]==' ' and lines[1][i]==' ' and lines[2][i]==' ' and lines[3][i]==' ':
+            # 无效列
+            continue
+        # 对于target或者query的1列来说，只有三种情况
+        # 1.都为空白
+        if lines[0][i]==' ' and lines[1][i]==' ':
+            pass
+        # 2.一个没有匹配上的base
+        elif lines[0][i]!=' ' and lines[1][i]==' ':
+            target_seq += lines[0][i]
+            target_note += '.'
+        # 3.一个匹配上的base
+        elif lines[0][i]==' ' and lines[1][i]!=' ':
+            target_seq += lines[1][i]
+            target_note += '('
+        else:
+            raise Exception('Invalid RNAhybrid Illustration')
+        
+        # 同理，处理query
+        # 1.都为空白
+        if lines[2][i]==' ' and lines[3][i]==' ':
+            pass
+        # 2.一个没有匹配上的base
+        elif lines[3][i]!=' ' and lines[2][i]==' ':
+            query_seq += lines[3][i]
+            query_note += '.'
+        # 3.一个匹配上的base
+        elif lines[3][i]==' ' and lines[2][i]!=' ':
+            query_seq += lines[2][i]
+            query_note += ')'
+        else:
+            raise Exception('Invalid RNAhybrid Illustration')
+    
+    # 只取interaction区域的sequence和notation
+    target_seq, target_note = getBindOnly(target_seq, target_note, '(')
+    query_seq, query_note = getBindOnly(query_seq, query_note, ')')
+    
+    # 用'&'连接target和query，并且query反向
+    return target_seq+'&'+query_seq[::-1], target_note+'&'+query_note[::-1]
+
+
+# ---------------------其余解析用小函数-------------------------------
+def getStartEnd(full_seq, sub_seq, start_index=None):
+    '''计算sub_seq在full_seq中的起止坐标
+    坐标从**1**开始
+    '''
+
+    if not start_index:
+        start_index = 0
+    # 在start_index上下游范围内检索
+    # 上游范围不宜放宽，否则会找到位于其它位置的同样序列
+    # 下游范围不宜过窄，否则像ts-100这样长度为47的tRF，整个匹配长度会超过100，从而报错
+    start = max(0, start_index-1)
+    stop = min(len(full_seq), start_index+len(sub_seq)+50)
+    
+    # 如果找不到sub_seq，index函数会报错
+    sub_start = full_seq.index(sub_seq, start, stop)
+    
+    # 返回以**1**为起点的起止坐标，并转为整数形式
+    return int(sub_start+1), int(sub_start+len(sub_seq)-1+1)
+    
+# ---------------------解析RNAhybrid原始结果函数-------------------------------
+def getPart(pos, part_dict):
+    '''根据绑定位置，以及mRNA的区域起止说明
+    判断绑定点位于哪一个区域
+    '''
+    tmp_pos = int(pos)
+    for k, v in part_dict.items():
+        # 分隔起止位置
+        tmp = v.split('-')
+        if tmp_pos>=int(tmp[0]) and tmp_pos<=int(tmp[1]):
+            return k
+    
+    
+def iterBlocks(lines):
+    '''逐行读取RNAhybrid的输出，每遇到分隔符'\n\n\n'即返回一个匹配结果block
+    lines为任意逐行迭代的对象，如subprocess的stdout，每行以'\n'结尾
+    与text.strip().split('\n\n\n')的结果一致，但无需将全部输出读入内存
+    '''
+    buf = ''
+    for line in lines:
+        buf += line
+        if buf.endswith('\n\n\n'):
+            block = buf[:-3].strip()
+            if block:
+                yield block
+            buf = ''
+    # 最后一个block后面没有分隔符
+    block = buf.strip()
+    if block:
+        yield block
+
+
+def parseBlock(block):
+    '''解析一个匹配结果block
+    以分隔符'\n\n'可以将每一个block细分为3部分
+    返回tRF_ID, Transcript_ID, MFE, P_Val, Pos, subseqDP, hybridDP, Max_Hit_Len, Max_Hit_DP
+    RNAhybrid的示意图直接转换为dot-bracket notation，最长的连续匹配也从dot-bracket notation得到，不再保存原始示意图
+    '''
+    total_parts = block.split('\n\n')
+    # 第一部分包含target mRNA的ID和Length，以及miRNA的ID和Length
+    # 但是可能存在一行无用信息，如target too long，其后面无空白行，且可能存在多行
+    # 因此抽取信息时，使用倒数索引
+    first_part = total_parts[0].split('\n')
+    
+    trf_id = first_part[-2].split(':')[1].strip()
+    # 解析mRNA编号, excluding the beginning string "target: "
+    # 注意：mRNA ID中也包含':'
+    # skip parsing gene Ensembl ID and other info
+    tran_id = first_part[-4].split(': ')[1].strip()
+    # 最后一个为空字符串，倒数2-4为'UTR5','CDS','UTR3'起止位置，但不一定3个部分都有
+    # also skip parsing
+   
+    # 第二部分包含能量和p值
+    second_part = total_parts[1].split('\n')
+    # 不记录能量单位kcal/mol
+    mfe = second_part[0].split(':')[1].strip().split()[0]
+    p_val = second_part[1].split(':')[1].strip()
+    # 第三部分包含匹配位置和示意图
+    tmp_index = total_parts[2].find('\n')
+    pos = total_parts[2][:tmp_index].split()[1]
+    demo = total_parts[2][tmp_index:].strip().replace('miRNA', 'tRF  ')
+    # 从RNAhybrid的Demo中抽取interaction图示
+    subseq, hybrid = parseDemo(demo)
+    # 计算连续匹配上的bases的最大长度，以及最长的连续匹配序列
+    max_len, max_hit = getHits(subseq, hybrid)
+    # 计算匹配位置属于哪一个区域
+    # skipped
+    return trf_id, tran_id, mfe, p_val, pos, subseq, hybrid, max_len, max_hit
+
+
+def parseResult(lines, trf_id=None, mcl=0, mfe=None):
+    '''解析RNAhybrid本地运行返回的结果
+    本地当前版本为2.1.2
+    Update: parse the output incrementally, only the kept entries are held in RAM
+    Update: entries with Max_Hit_Len < mcl or MFE > mfe are filtered out
+    Update: tRF序列作为命令行参数时，RNAhybrid输出的tRF ID为"command_line"，用trf_id替换
+    返回保存的entries组成的dataframe，以及被过滤的entries数目
+    '''
+    
+    cols = ['tRF_ID', 'Transcript_ID', 'MFE', 'P_Val', 'Pos', 'subseqDP', 'hybridDP', 'Max_Hit_Len', 'Max_Hit_DP']
+    
+    entries = []
+    n_filtered = 0
+    for block in iterBlocks(lines):
+        entry = parseBlock(block)
+        # 抽取匹配长度大于等于mcl的序列
+        if entry[7] < mcl or (mfe is not None and float(entry[2]) > mfe):
+            n_filtered += 1
+            continue
+        if trf_id is not None:
+            entry = (trf_id,) + entry[1:]
+        entries.append(entry)
+    
+    data = pd.DataFrame.from_records(entries, columns=cols)
+    data = data.astype({'P_Val':'float64', 'tRF_ID':str, 'Transcript_ID': str,
+                        'Pos':'int64', 'MFE':'float64', 'Max_Hit_Len':'int64'})
+    return data, n_filtered
+    
+    
+def waitProcess(proc):
+    '''用os.wait4等待子进程结束，设置proc.returncode（被signal终止时为负数，与subprocess一致）
+    返回returncode和该进程的resource usage
+    '''
+    _, status, usage = os.wait4(proc.pid, 0)
+    proc.returncode = -os.WTERMSIG(status) if os.WIFSIGNALED(status) else os.WEXITSTATUS(status)
+    return proc.returncode, usage
+
+
+def rna_work(job, mcl=0, mfe=None):
+    '''执行一个RNAhybrid job，job为(job名称, tRF ID, bash命令)
+    解析结果时过滤Max_Hit_Len < mcl或MFE > mfe的entries
+    返回job的运行统计（Meter.record，CPU time和peak RSS包括RNAhybrid进程），以及保存的entries组成的dataframe
+    '''
+    name, trf_id, cmd = job
+    start_time = time()
+    meter = Meter()
+    print('----------------------------------')
+    print('Excuted bash command: "{}"'.format(' '.join(cmd)))
+    
+    # read the stdout line by line and parse on the fly, instead of holding the whole output
+    with Popen(cmd, stdout=PIPE, encoding='utf-8') as proc:
+        try:
+            data, n_filtered = parseResult(proc.stdout, trf_id, mcl, mfe)
+        except Exception as err:
+            # RNAhybrid中途退出（如被OOM kill）时，最后一个block不完整导致解析出错
+            # 读完剩余的输出后等待其结束，exit status不为0时报告RNAhybrid的错误
+            for _ in proc.stdout:
+                pass
+            if waitProcess(proc)[0] != 0:
+                raise CalledProcessError(proc.returncode, cmd) from err
+            raise
+        # 等待RNAhybrid结束，同时得到该进程的CPU time和peak RSS
+        _, usage = waitProcess(proc)
+    if proc.returncode != 0:
+        raise CalledProcessError(proc.returncode, cmd)
+    print('----------------------------------')
+    print('Job "{}" parsed successfully. Total {:,} entries, {:,} entries filtered out.'.format(name, data.shape[0], n_filtered))
+    elapsed_time = (time()-start_time)/3600.0
+    print('Elapsed time: {:.2f} hours.'.format(elapsed_time))
+    record = meter.record('RNAhybrid', name, Entries_In=data.shape[0]+n_filtered, Entries_Kept=data.shape[0])
+    record['CPU_Seconds'] = round(record['CPU_Seconds'] + usage.ru_utime + usage.ru_stime, 3)
+    record['Peak_RSS_MB'] = max(record['Peak_RSS_MB'], round(rusageMB(usage), 1))
+    return record, data
+    
+       
+# ---------------------合并每个tRF的结果-------------------------------
+# 合并用到的序列信息，在子进程中通过initCombine设置
+tran_seq = None
+trf_seq = None
+
+# recorde all columns for saving
+# update: do not save p value 
+cols = ['tRF_ID', 'Transcript_ID', 'MFE', 'Demo', 'Max_Hit_Len', 'Start_tRF', 'End_tRF', 'Start_Target', 'End_Target', 'Tool', 'HybridDP', 'SubseqDP', 'Max_Hit_DP']
+
+
+def initCombine(tran_seq_dict, trf_seq_dict):
+    '''进程池的initializer，设置transcript和tRF序列的dict
+    fork方式创建子进程时无需复制
+    '''
+    global tran_seq, trf_seq
+    tran_seq = tran_seq_dict
+    trf_seq = trf_seq_dict
+
+
+def combineResult(trf_id, one_tRF_parts, demo=True, file_format='csv'):
+    '''进一步解析tRF trf_id的所有job的结果（rna_work返回的dataframe），删除重复entries
+    同一个tRF的各部分结果按target顺序合并
+    返回encodeTable的结果，由主进程按tRF顺序追加至大文件
+    Max_Hit_Len < mcl的entries在解析RNAhybrid结果时已被过滤，Max_Hit_Len和Max_Hit_DP也已得到
+    demo为False时不生成示意图，Demo column留空
+    同时返回运行统计
+    '''
+    start_time = time()
+    meter = Meter()
+    print('Processing tRF "{}"...'.format(trf_id))
+    data = pd.concat(one_tRF_parts, ignore_index=True)
+    n_entries = data.shape[0]
+        
+    print('Total {:,} entries'.format(data.shape[0]))
+    # 示意图之后按需生成时留空
+    data = data.assign(Demo='')
+    if data.shape[0] == 0:
+        # 没有剩余entries时，补齐下面生成的列，保持输出格式一致
+        data = data.reindex(columns=list(data.columns)+['Start_Target', 'End_Target', 'Start_tRF', 'End_tRF'])
+    
+    # 进一步解析结果
+    for i in data.index:
+       # 确定interaction在tRF和transcript上的起止坐标
+       # 坐标以**1**为起点
+       # RNAhybrid的结果，pos从0开始
+       # 注意tRF的interaction序列无需反转（本来就是5'->3'方向）
+       data.at[i, 'Start_Target'], data.at[i, 'End_Target'] = getStartEnd(
+            tran_seq[data.at[i, 'Transcript_ID']], data.at[i, 'subseqDP'].split('&')[0],
+            data.at[i, 'Pos'])
+       data.at[i, 'Start_tRF'], data.at[i, 'End_tRF'] = getStartEnd(
+            trf_seq[data.at[i, 'tRF_ID']], data.at[i, 'subseqDP'].split('&')[1])
+       if demo:
+           # 生成新demo，否则之后由trftarget.render按需生成
+           data.at[i, 'Demo'] = getDemo(tran_seq[data.at[i, 'Transcript_ID']],
+               int(data.at[i, 'Start_Target']), int(data.at[i, 'End_Target']),
+               trf_seq[data.at[i, 'tRF_ID']],
+               int(data.at[i, 'Start_tRF']), int(data.at[i, 'End_tRF']),
+               data.at[i, 'subseqDP'], data.at[i, 'hybridDP'])
+
+    # 确认重复entries
+    # 根据时间测试结果，该功能通常条件下需要花费1小时，需要进行优化，避免重复进行dataframe的column操作
+    # 优化后耗时通常条件下为2分钟
+    
+    # 对所有entries进行排序
+    data.sort_values(['Transcript_ID', 'MFE', 'Max_Hit_Len'],
+                 ascending=[True, True, False], inplace=True)
+
+    to_del = checkDuplicate(data)
+    
+    print('detected {:d} duplicated interactions'.format(len(to_del)))
+    
+    # 删除重复entries by index
+    if len(to_del) > 0:
+        data.drop(to_del, inplace=True)
+
+    # 准备保存成大CSV文件
+    data.drop(columns=['Pos'], inplace=True)
+    data.rename(columns={'hybridDP': 'HybridDP', 'subseqDP': 'SubseqDP'}, inplace=True)
+    data['Tool'] = 'RNAhybrid'
+    
+    print('Elapsed time: {:.2f} hours.'.format((time()-start_time)/3600.0))
+    encoded = encodeTable(data, cols, file_format)
+    return encoded, meter.record('RNAhybrid combine', trf_id, Entries_In=n_entries, Entries_Kept=data.shape[0],
+                                 Duplicates_Removed=len(to_del), Bytes_Written=encodedSize(encoded))
+
+
+def scheduleJobs(jobs, costs, n_cores, callback=None, mcl=0, mfe=None):
+    '''并行执行所有RNAhybrid job
+    解析结果时过滤Max_Hit_Len < mcl或MFE > mfe的entries
+    按预估耗时从大到小分发，空闲进程每次只领取1个job，避免耗时长的job排在最后导致CPU空闲
+    每个job完成后立即调用callback(job运行信息, 解析结果)
+    返回每个job的运行统计，顺序为完成的顺序
+    '''
+    order = sorted(range(len(jobs)), key=lambda i: costs[i], reverse=True)
+    pool = Pool(n_cores)
+    results = []
+    for result, data in pool.imap_unordered(partial(rna_work, mcl=mcl, mfe=mfe), [jobs[i] for i in order], chunksize=1):
+        results.append(result)
+        if callback is not None:
+            callback(result, data)
+    # 关闭线程池，等待工作结束
+    pool.close()
+    pool.join()
+    return results
+
+
+def reportJobs(results, cost_dict):
+    '''比较每个job的预估耗时(query长度*target总长度)和实际耗时
+    用全部job的平均速度，将预估耗时换算成秒
+    同时报告每个job保存和被过滤（Max_Hit_Len < mcl或MFE > mfe）的entries数目
+    '''
+    total_cost = sum(cost_dict[result['Job']] for result in results)
+    total_time = sum(result['Wall_Seconds'] for result in results)
+    rate = total_time / total_cost if total_cost > 0 else 0.0
+    print('----------------------------------')
+    print('Job cost estimate vs. actual runtime ({:.3g} seconds per unit cost):'.format(rate))
+    for result in sorted(results, key=lambda x: cost_dict[x['Job']], reverse=True):
+        name = result['Job']
+        print('{}: cost {:,}, estimated {:.1f} seconds, actual {:.1f} seconds, {:,} entries kept, {:,} filtered out'.format(
+                name, cost_dict[name], cost_dict[name]*rate, result['Wall_Seconds'],
+                result['Entries_Kept'], result['Entries_In']-result['Entries_Kept']))
+    print('Total {:,} entries kept, {:,} entries filtered out during parsing'.format(
+            sum(result['Entries_Kept'] for result in results),
+            sum(result['Entries_In']-result['Entries_Kept'] for result in results)))
+
+
+def groupQueries(trf_lens, n_cores, n_shards, group_size=0):
+    '''将tRFs按原始顺序分组，每组与每个target部分一次调用RNAhybrid
+    group_size > 0时，每组固定group_size个tRFs
+    group_size为0时使用cost model：预计总耗时 = (所有计算量 + 调用次数*CALL_OVERHEAD) / n_cores + 最大job的计算量
+    n个tRFs，平均长度l，每组query总长度为b时，调用次数为n*l/b*n_shards，最大job约为b/n_shards
+    使预计总耗时最小的b为sqrt(n*l*CALL_OVERHEAD*n_shards/n_cores)，按累计长度达到b分组
+    返回每组tRFs的index
+    '''
+    n = len(trf_lens)
+    if n == 0:
+        return []
+    if group_size > 0:
+        return [list(range(k, min(k+group_size, n))) for k in range(0, n, group_size)]
+    budget = (sum(trf_lens) * CALL_OVERHEAD * n_shards / n_cores) ** 0.5
+    groups = [[]]
+    group_len = 0
+    for i, trf_len in enumerate(trf_lens):
+        if group_len >= budget:
+            groups.append([])
+            group_len = 0
+        groups[-1].append(i)
+        group_len += trf_len
+    return groups
+
+
+def loadManifest(directory, run_config):
+    '''读取directory中上次运行的manifest.json
+    输入文件和参数与run_config一致时返回manifest，否则返回None
+    '''
+    try:
+        with open(os.path.join(directory, 'manifest.json'), 'rt') as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+    if manifest.get('config') != run_config:
+        print('WARNING: inputs or options differ from the checkpointed run in "{}", start from scratch!'.format(directory))
+        return None
+    return manifest
+
+
+def saveManifest(directory, manifest):
+    '''保存manifest.json，先写入临时文件再替换
+    '''
+    manifest_file = os.path.join(directory, 'manifest.json')
+    with open(manifest_file + '.tmp', 'wt') as f:
+        json.dump(manifest, f)
+    os.replace(manifest_file + '.tmp', manifest_file)
+
+
+def getCheckpoint(directory, name):
+    return os.path.join(directory, 'checkpoints', name + '.pkl')
+
+
+def saveCheckpoint(directory, name, data):
+    '''保存一个job的解析结果，先写入临时文件再替换，文件存在即表示该job已完成
+    '''
+    checkpoint_file = getCheckpoint(directory, name)
+    data.to_pickle(checkpoint_file + '.tmp')
+    os.replace(checkpoint_file + '.tmp', checkpoint_file)
+
+
+def splitTarget(target_file, lengths, n_shards, directory):
+    '''将target fasta文件按序列顺序切分成n_shards个连续的部分，以实现并行计算
+    每个部分的序列总长度尽量相等，而不是序列数目相等
+    lengths为target fasta文件中每条序列的长度
+    直接复制原始文件中的行，不改变序列ID和格式
+    返回每个部分的文件名和序列总长度
+    '''
+    n_shards = max(1, min(n_shards, len(lengths)))
+    if n_shards == 1:
+        # 无需切分，直接使用原始文件
+        return [(target_file, int(sum(lengths)))]
+    
+    # 按累计长度确定切分点，第k个部分从累计长度首次超过k*total/n_shards的序列开始
+    cum_len = np.cumsum(lengths)
+    bounds = np.searchsorted(cum_len, cum_len[-1] * np.arange(1, n_shards) / n_shards, side='right')
+    bounds = np.concatenate(([0], bounds, [len(lengths)]))
+    # 去掉空的部分
+    bounds = np.unique(bounds)
+    
+    shards = []
+    for j in range(len(bounds)-1):
+        shards.append((os.path.join(directory, 'transcripts_{:d}.fasta'.format(j)),
+                       int(sum(lengths[bounds[j]:bounds[j+1]]))))
+    
+    # 逐行复制，遇到'>'即为新序列的开始
+    shard_ind = -1
+    record_ind = -1
+    out = None
+    with open(target_file, 'rt') as f:
+        for line in f:
+            if line.startswith('>'):
+                record_ind += 1
+                if record_ind == bounds[shard_ind+1]:
+                    if out is not None:
+                        out.close()
+                    shard_ind += 1
+                    out = open(shards[shard_ind][0], 'wt')
+            if out is not None:
+                out.write(line)
+    out.close()
+    
+    return shards
+
+
+def rna_analysis(target_file, query_file, output_path, n_cores, mfe=-15, mcl=6, suboptimal=1, n_shards=0, file_format='csv', demo=True, group_size=0,
+                 cache_dir=None, cache_size=None, resume=False):
+    '''执行tRFs与mRNA的配对
+    Update: the target fasta file is split into n_shards parts balanced by total sequence length,
+    and each tRF is run against each part, so a few tRFs can still use all CPU cores.
+    If n_shards is 0, use just enough parts to give every CPU core a job
+    Update: file_format sets the format of the output tables, csv or parquet
+    Update: if demo is False, the Demo column is left empty, and demos can be rendered later by trftarget.render
+    Update: several tRFs are run in one RNAhybrid call, group_size tRFs per group, or chosen by groupQueries if 0
+    Update: if cache_dir is given, the parsed hits of each tRF are cached there, keyed by tRF sequence, target file,
+    RNAhybrid binary and options, so only tRFs not in the cache are run. cache_size is the size limit in bytes
+    Update: if resume is True, the parsed result of each job is checkpointed in RNA_tmp_files, and a restarted run
+    with the same inputs and options keeps the target split and tRF groups of manifest.json and only runs unfinished jobs
+    Update: wall time, CPU time, peak RSS and entries of each job are saved as rnahybrid_metrics.json and .csv
+    '''
+    meter = Meter(children=True)
+    
+    # 定义最终保存文件的文件名
+    # 最终保存的大文件路径加文件名
+    binding_file = getTableFile(output_path, 'rnahybrid_results', file_format)
+    trf_info_file = getTableFile(output_path, 'trfs_info', file_format)
+    tran_info_file = getTableFile(output_path, 'transcripts_info', file_format)
+    
+    # 测试target mRNA文件是否为fasta格式
+    with open(target_file, 'rt') as f:
+        # If it's not a fasta file, any function will return false
+        if not any(SeqIO.parse(f, 'fasta')):
+            raise Exception('Input target file "{}" is not a valid fasta file!'.format(target_file))
+    
+    # 测试query tRFs文件是否为fasta格式
+    with open(query_file, 'rt') as f:
+        # If it's not a fasta file, any function will return false
+        if not any(SeqIO.parse(f, 'fasta')):
+            raise Exception('Input query file "{}" is not a valid fasta file!'.format(query_file))
+        
+    # 每一条query sequence直接作为RNAhybrid的参数，以实现并行计算
+    count = 0
+    tRF_info = []
+    with open(query_file, 'rt') as f:
+        for record in SeqIO.parse(f, 'fasta'):
+            count += 1
+            # tRF_ID是unique的
+            tRF_info.append({'tRF_ID': str(record.id).strip(),
+                             'tRF_Seq': str(record.seq).strip(),
+                             'tRF_Length': len(record.seq.strip())})
+    print('Total {:d} tRF sequences.'.format(count))
+    
+    # tRF信息存入文件
+    writeTable(pd.DataFrame(tRF_info), trf_info_file)
+    # 特别建立一个tRFs序列的dict，方便查询，并且'T'变成'U'
+    trf_seq = {}
+    for item in tRF_info:
+        trf_seq[item['tRF_ID']] = item['tRF_Seq'].replace('T', 'U')
+    # check whether all tRF IDs are unique
+    assert len(trf_seq) == count, 'Duplicated IDs exist in the tRF fasta file!'
+    # RNAhybrid使用原始序列
+    query_list = [(item['tRF_ID'], item['tRF_Seq']) for item in tRF_info]
+        
+    del tRF_info
+    
+    # 准备附加信息
+    # 1.tRF信息dict tRF_infos，用tRF ID索引，已存入文件
+    
+    # 2.gene symbol信息dict gene_symbol，用gene ensembl id索引
+    # skipped
+    
+    # 3.transcript type和name信息rna_infos，用transcript ensembl id索引
+    # skipped
+    
+    # 4.transcript 序列信息rna_seq，用transcript ensembl id索引
+    # skip transcript parsing
+    # transcript信息逐块写入文件，同时写入序列库（'T'变成'U'），无需将所有序列保存在内存中
+    # 表格先于序列库close，序列库记录的是写入完成后表格的大小和mtime
+    with open(target_file, 'rt') as f, SeqStoreWriter(getStorePrefix(output_path), tran_info_file) as store_writer, \
+            TableWriter(tran_info_file, ['Trans_ID', 'Trans_Seq', 'Trans_Length']) as info_writer:
+        rna_seq = []
+        for record in SeqIO.parse(f, 'fasta'):
+            # skip transcript ID parsing
+            rna_seq.append({'Trans_ID': str(record.id).strip(),
+                            'Trans_Seq': str(record.seq).strip(),
+                            'Trans_Length': len(record.seq.strip())})
+            store_writer.write(rna_seq[-1]['Trans_ID'], rna_seq[-1]['Trans_Seq'])
+            if len(rna_seq) == INFO_CHUNK_SIZE:
+                info_writer.write(pd.DataFrame(rna_seq))
+                rna_seq = []
+        if len(rna_seq) > 0:
+            info_writer.write(pd.DataFrame(rna_seq))
+        del rna_seq
+        # check whether all transcript IDs are unique
+        assert len(set(store_writer.ids)) == len(store_writer.ids), 'Duplicated IDs exist in the target fasta file!'
+    # transcript序列库，用法与dict相同，子进程共享
+    tran_seq = SeqStore(getStorePrefix(output_path))
+    
+    # 断点续跑时，沿用上次运行的target切分和tRFs分组
+    directory = os.path.join(output_path, 'RNA_tmp_files')
+    manifest = None
+    if resume:
+        run_config = {'query': fileDigest(query_file), 'target': fileDigest(target_file), 'RNAhybrid': fileDigest(RNAHYBRID),
+                      'suboptimal': suboptimal, 'mfe': mfe, 'mcl': mcl}
+        manifest = loadManifest(directory, run_config)
+    groups = [] if manifest is None else manifest['groups']
+    covered = set(i for group in groups for i in group)
+    
+    # 查询缓存，缓存中已有的tRFs不再运行RNAhybrid
+    cache = None
+    cached = {} # tRF index对应的缓存结果
+    if cache_dir is not None:
+        cache = ResultCache(cache_dir, cache_size)
+        target_digest = fileDigest(target_file)
+        tool_digest = fileDigest(RNAHYBRID)
+        cache_keys = [cache.getKey('RNAhybrid', trf_seq_raw, target_digest, tool_digest, suboptimal, mfe, mcl)
+                      for _, trf_seq_raw in query_list]
+        for i, key in enumerate(cache_keys):
+            if i in covered:
+                continue
+            data = cache.load(key)
+            if data is not None:
+                cached[i] = data
+        print('{:d} of {:d} tRFs found in cache "{}".'.format(len(cached), count, cache_dir))
+    todo = [i for i in range(count) if i not in cached and i not in covered]
+    
+    # 切分target fasta文件
+    if manifest is not None:
+        n_shards = manifest['n_shards']
+    elif len(todo) == 0:
+        n_shards = 1
+    elif n_shards == 0:
+        n_shards = -(-n_cores // len(todo))
+    n_shards = max(1, min(n_shards, len(tran_seq)))
+    # tRFs分组，续跑时只对上次未分组的tRFs（例如已从缓存中删除）分组
+    groups = groups + [[todo[k] for k in group] for group in
+                       groupQueries([len(trf_seq[query_list[i][0]]) for i in todo], n_cores, n_shards, group_size)]
+    if len(groups) > 0:
+        print('{:d} tRFs grouped into {:d} RNAhybrid queries, at most {:d} tRFs per query.'.format(
+                sum(len(group) for group in groups), len(groups), max(len(group) for group in groups)))
+    if manifest is not None:
+        print('Resume the checkpointed run in directory "{}"'.format(directory))
+    elif resume or n_shards > 1 or any(len(group) > 1 for group in groups):
+        # 在输出路径下建立temporary directory，保存切分后的target fasta文件，多个tRFs的query文件，以及断点续跑的checkpoints
+        if os.path.isdir(directory):
+            # 删除文件夹后，再新建
+            rmtree(directory)
+            print('WARNING: directory "{}" removed!'.format(directory))
+        os.mkdir(directory)
+        print('Temporary directory "{}" created!'.format(directory))
+    else:
+        directory = None
+    if resume:
+        os.makedirs(os.path.join(directory, 'checkpoints'), exist_ok=True)
+        saveManifest(directory, {'config': run_config, 'n_shards': n_shards, 'groups': groups})
+    shards = splitTarget(target_file, tran_seq.lengths, n_shards, directory)
+    print('Target sequences split into {:d} parts.'.format(len(shards)))
+    
+    # 每组tRFs与每个target部分的组合为一个job
+    jobs = [] # 需要执行的job：(job名称, tRF ID, bash命令)
+    cost_dict = {} # 每个job的预估耗时，用query长度*target总长度表示
+    job_dict = {} # 每个job对应的tRFs和target部分
+    trf_jobs = {} # 每个tRF对应的jobs
+    finished = [] # 续跑时已完成的jobs
+    for group in groups:
+        query_len = sum(len(trf_seq[query_list[i][0]]) for i in group)
+        if len(group) == 1:
+            # 单个tRF，序列直接作为参数，RNAhybrid输出的tRF ID需要替换
+            group_name = 'tRF_{:d}'.format(group[0])
+            trf_id = query_list[group[0]][0]
+            query = [query_list[group[0]][1]]
+        else:
+            # 多个tRFs保存为一个query文件，RNAhybrid输出中包含tRF ID
+            group_name = 'tRFs_{:d}-{:d}'.format(group[0], group[-1])
+            trf_id = None
+            query_file = os.path.join(directory, group_name+'.fasta')
+            with open(query_file, 'wt') as f:
+                for i in group:
+                    f.write('>{}\n{}\n'.format(*query_list[i]))
+            query = ['-q', query_file]
+        for j, (tmp_target_file, target_len) in enumerate(shards):
+            if len(shards) == 1:
+                name = group_name + '_result'
+            else:
+                name = '{}_shard_{:d}_result'.format(group_name, j)
+            cost_dict[name] = query_len * target_len
+            job_dict[name] = (group, j)
+            for i in group:
+                trf_jobs.setdefault(i, []).append(name)
+            if resume and os.path.isfile(getCheckpoint(directory, name)):
+                finished.append(name)
+                continue
+            jobs.append((name, trf_id, [RNAHYBRID, '-t', tmp_target_file,
+                             '-b', str(suboptimal), '-e', str(mfe), '-m', str(150000),
+                             '-n', str(70), '-s', '3utr_human'] + query))
+    
+    # Python调用bash命令，执行并行计算
+    print('Total number of CPUs: {:d}.'.format(cpu_count()))
+    print('{:d} CPUs will be used for RNAhybrid.'.format(n_cores))
+    # 某个tRF的所有RNAhybrid job完成后，立即在另一个进程池中进一步解析其结果
+    # 同时按tRF顺序将解析完成的结果合并成一个大文件
+    print('Combining results of each tRF as soon as its RNAhybrid jobs finish...')
+    combine_pool = Pool(n_cores, initializer=initCombine, initargs=(tran_seq, trf_seq))
+    # 每个tRF各个job的解析结果，按target部分的顺序排列
+    parts = [[None] * len(shards) for i in range(count)]
+    remain_jobs = [len(shards)] * count
+    combined = [None] * count
+    # 写入header
+    binding_writer = TableWriter(binding_file, cols)
+    next_write = 0
+    # 每个tRF合并的运行统计
+    combine_records = []
+    # 缓存中的tRFs直接解析，tRF ID以本次输入为准
+    for i, data in cached.items():
+        remain_jobs[i] = 0
+        combined[i] = combine_pool.apply_async(combineResult, (query_list[i][0], [data.assign(tRF_ID=query_list[i][0])], demo, file_format))
+    del cached
+    
+    def writeCombined(wait=False):
+        '''按tRF顺序，将已解析完成的结果追加至大文件
+        wait为True时，等待所有结果解析完成
+        '''
+        nonlocal next_write
+        while next_write < count and combined[next_write] is not None:
+            if not (wait or combined[next_write].ready()):
+                break
+            encoded, record = combined[next_write].get()
+            binding_writer.write(encoded)
+            combine_records.append(record)
+            # 释放已写入的结果
+            combined[next_write] = None
+            next_write += 1
+    
+    def addPart(name, data):
+        group, j = job_dict[name]
+        # 按tRF_ID拆分一组tRFs的结果
+        if len(group) > 1:
+            trf_rows = data.groupby('tRF_ID', sort=False).indices
+            # RNAhybrid输出的tRF ID需要与query中的完全一致，否则这些hits会被遗漏
+            unknown = set(trf_rows) - {query_list[i][0] for i in group}
+            if len(unknown) > 0:
+                raise Exception('RNAhybrid job "{}" returns hits of unexpected tRF IDs: {}!'.format(
+                        name, ', '.join(sorted(unknown))))
+        for i in group:
+            if len(group) == 1:
+                parts[i][j] = data
+            else:
+                parts[i][j] = data.iloc[trf_rows.get(query_list[i][0], [])]
+            remain_jobs[i] -= 1
+            if remain_jobs[i] == 0:
+                # 合并前确认该tRF的所有job都已保存checkpoint
+                missing = [one_job for one_job in trf_jobs[i] if resume and not os.path.isfile(getCheckpoint(directory, one_job))]
+                if len(missing) > 0:
+                    raise Exception('Checkpoints of jobs {} are missing for tRF "{}"!'.format(', '.join(missing), query_list[i][0]))
+                if cache is not None:
+                    cache.save(cache_keys[i], pd.concat(parts[i], ignore_index=True))
+                combined[i] = combine_pool.apply_async(combineResult, (query_list[i][0], parts[i], demo, file_format))
+                parts[i] = None
+        writeCombined()
+    
+    def onJobDone(result, data):
+        if resume:
+            saveCheckpoint(directory, result['Job'], data)
+        addPart(result['Job'], data)
+    
+    # 读入已完成jobs的解析结果
+    if len(finished) > 0:
+        print('{:d} of {:d} RNAhybrid jobs already finished, loaded from checkpoints.'.format(len(finished), len(job_dict)))
+    for name in finished:
+        addPart(name, pd.read_pickle(getCheckpoint(directory, name)))
+    del finished
+    
+    results = scheduleJobs(jobs, [cost_dict[job[0]] for job in jobs], n_cores, onJobDone, mcl, mfe)
+    reportJobs(results, cost_dict)
+    
+    writeCombined(wait=True)
+    if next_write < count:
+        raise Exception('Results of {:d} tRFs are missing!'.format(count-next_write))
+    binding_writer.close()
+    combine_pool.close()
+    combine_pool.join()
+    
+    
+    print('All results inserted into big file "{}"'.format(binding_file))
+    
+    # 程序运行统计存入JSON和CSV文件
+    saveReport(output_path, 'RNAhybrid', results + combine_records, meter.record('RNAhybrid', 'total',
+               Entries_In=sum(result['Entries_In'] for result in results),
+               Entries_Kept=sum(record['Entries_Kept'] for record in combine_records),
+               Duplicates_Removed=sum(record['Duplicates_Removed'] for record in combine_records),
+               Bytes_Written=fileSize(binding_file)))
+    
+    if cache is not None:
+        cache.report()
+    
+    
+    # 删除临时文件夹
+    if directory is not None:
+        rmtree(directory)
+        print('WARNING: temporary directory "{}" removed!'.format(directory))
+    
+    
+    return True
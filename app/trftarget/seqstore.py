@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+'''
+紧凑的只读序列库，代替{ID: 序列}的dict保存所有transcript序列
+所有序列（'T'已变成'U'）首尾相连保存为一个byte文件<prefix>.bin，每个base 1 byte
+ID，起点和长度保存为<prefix>.npz，同时保存生成序列库时transcripts_info表格的大小和mtime，表格改变后重新生成
+byte文件通过mmap读取，不占用进程的内存，fork创建的子进程共享同一份page cache，无需复制
+按ID取序列的用法与dict相同，返回字符串，因此getStartEnd和getDemo无需改动
+'''
+
+
+import os
+import mmap
+import numpy as np
+from .table import iterTable
+
+
+# 与transcripts_info保存在同一文件夹中的transcript序列库
+TRANSCRIPT_STORE = 'transcripts_seq'
+
+# 从transcripts_info生成序列库时，每次读入的rows数目
+CHUNK_SIZE = 10000
+
+
+def getSource(source):
+    '''序列来源文件的(大小, mtime)，mtime精确至ns
+    '''
+    stat = os.stat(source)
+    return stat.st_size, stat.st_mtime_ns
+
+
+class SeqStoreWriter:
+    '''逐条写入序列，close时保存索引
+    source为序列来源的transcripts_info表格，close时记录其大小和mtime，因此需要在表格写入完成后close
+    先写入临时文件再替换，正在使用旧序列库的进程不受影响，用with语句时出错则不保存
+    '''
+
+    def __init__(self, prefix, source):
+        self.prefix = prefix
+        self.source = source
+        self.out = open(prefix + '.bin.tmp', 'wb')
+        self.ids = []
+        self.lengths = []
+
+    def write(self, seq_id, seq):
+        self.out.write(seq.replace('T', 'U').encode('latin-1'))
+        self.ids.append(seq_id)
+        self.lengths.append(len(seq))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *args):
+        if exc_type is None:
+            self.close()
+        else:
+            # 出错时不保存
+            self.out.close()
+            os.remove(self.prefix + '.bin.tmp')
+
+    def close(self):
+        self.out.close()
+        lengths = np.array(self.lengths, dtype=np.int64)
+        offsets = np.cumsum(lengths) - lengths
+        # ID以换行符连接后保存为bytes，读取时无需pickle
+        ids = np.frombuffer('\n'.join(self.ids).encode('utf-8'), dtype=np.uint8)
+        with open(self.prefix + '.npz.tmp', 'wb') as f:
+            np.savez(f, ids=ids, offsets=offsets, lengths=lengths, source=np.array(getSource(self.source), dtype=np.int64))
+        os.replace(self.prefix + '.bin.tmp', self.prefix + '.bin')
+        os.replace(self.prefix + '.npz.tmp', self.prefix + '.npz')
+
+
+class SeqStore:
+    '''只读的序列库，store[ID]返回序列字符串，同一ID多次读取时每次重新解码，不缓存
+    '''
+
+    def __init__(self, prefix):
+        self.prefix = prefix
+        with np.load(prefix + '.npz') as index:
+            self.offsets = index['offsets']
+            self.lengths = index['lengths']
+            self.ids = index['ids'].tobytes().decode('utf-8').split('\n') if self.lengths.shape[0] > 0 else []
+            self.source = tuple(int(one) for one in index['source']) if 'source' in index.files else None
+        self.position = {seq_id: i for i, seq_id in enumerate(self.ids)}
+        if len(self.position) != len(self.ids):
+            raise Exception('Duplicated IDs exist in the sequence store "{}"!'.format(prefix))
+        with open(prefix + '.bin', 'rb') as f:
+            # 长度为0的文件无法mmap
+            if os.fstat(f.fileno()).st_size == 0:
+                self.data = b''
+            else:
+                self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __getitem__(self, seq_id):
+        i = self.position[seq_id]
+        start = self.offsets[i]
+        return self.data[start:start+self.lengths[i]].decode('latin-1')
+
+    def __contains__(self, seq_id):
+        return seq_id in self.position
+
+    def __len__(self):
+        return len(self.position)
+
+    def keys(self):
+        return list(self.ids)
+
+    def close(self):
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+
+    def __getstate__(self):
+        # spawn方式创建子进程时，只传递文件名，子进程重新mmap
+        return self.prefix
+
+    def __setstate__(self, prefix):
+        self.__init__(prefix)
+
+
+def getStorePrefix(directory):
+    return os.path.join(directory, TRANSCRIPT_STORE)
+
+
+def loadTranscripts(directory, info_file):
+    '''打开directory中的transcript序列库
+    不存在，或者不是由当前的transcripts_info表格info_file生成（大小或mtime不同）时，先从info_file生成
+    '''
+    prefix = getStorePrefix(directory)
+    if os.path.isfile(prefix + '.npz') and os.path.isfile(prefix + '.bin'):
+        store = SeqStore(prefix)
+        if store.source == getSource(info_file):
+            return store
+        store.close()
+    print('Build transcript sequence store "{}" from "{}"'.format(prefix, info_file))
+    with SeqStoreWriter(prefix, info_file) as writer:
+        for chunk in iterTable(info_file, CHUNK_SIZE, dtype={'Trans_ID': str}):
+            for seq_id, seq in zip(chunk['Trans_ID'], chunk['Trans_Seq']):
+                writer.write(seq_id, seq)
+    return SeqStore(prefix)
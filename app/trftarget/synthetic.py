@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+'''
+生成synthetic tRF和transcript序列，以及对应的RNAhybrid原始输出和IntaRNA输出，用于benchmark，无需RNAhybrid和IntaRNA程序
+每个interaction为synthetic序列上随机位置的helix（互补bases配对，其余为bulges和mismatches），坐标与序列一致
+因此可以和真实输出一样解析，确认重复entries，生成示意图并检查一致性
+生成的文件（directory中）：
+trfs.fasta和targets.fasta：synthetic序列
+rnahybrid/tRF_<i>.txt：每个tRF的RNAhybrid原始输出，相当于一个RNAhybrid job
+intarna_results.csv：IntaRNA输出（--outMode=C）
+rnahybrid_sites.csv：每个RNAhybrid interaction的tRF ID，transcript ID和target起止坐标，供检查一致性使用
+'''
+
+
+import os
+import json
+import random
+from math import ceil
+from .intarna import INTARNA_HEADER
+
+
+# 生成完成后保存的参数文件，存在时表示数据完整
+PARAMS_FILE = 'params.json'
+
+# 可以配对的bases，包括G-U
+PAIRS = {'AU', 'UA', 'GC', 'CG', 'GU', 'UG'}
+
+# 每个interaction至少包含的配对数
+MIN_PAIRS = 6
+
+
+def randomSeq(rng, length):
+    return ''.join(rng.choices('ACGT', k=length))
+
+
+def writeFasta(file_name, records):
+    with open(file_name, 'wt') as f:
+        for seq_id, seq in records:
+            f.write('>{}\n{}\n'.format(seq_id, seq))
+
+
+def isPair(base1, base2):
+    return base1 + base2 in PAIRS
+
+
+def makeSite(rng, target, trf):
+    '''随机选择target和tRF上的起点，沿target 5'->3'和tRF 3'->5'方向逐列延伸，生成RNAhybrid示意图的各列
+    每列为(target base, tRF base, 是否配对)，互补（包括G-U）时配对，否则随机形成bulge或mismatch
+    两端都是配对的列，至少包含MIN_PAIRS个配对
+    返回(columns, t_start, q_end)，t_start为target上的起点，q_end为tRF上最3'端配对base的位置（都从0开始）
+    '''
+    while True:
+        ti = t_start = rng.randint(0, len(target)-1)
+        qi = q_end = rng.randint(MIN_PAIRS-1, len(trf)-1)
+        if not isPair(target[ti], trf[qi]):
+            continue
+        max_cols = rng.randint(max(2*MIN_PAIRS, len(trf)//2), 2*len(trf))
+        columns = []
+        while ti < len(target) and qi >= 0 and len(columns) < max_cols:
+            if isPair(target[ti], trf[qi]):
+                columns.append((target[ti], trf[qi], True))
+                ti += 1
+                qi -= 1
+            elif ti+1 < len(target) and isPair(target[ti+1], trf[qi]) and rng.random() < 0.5:
+                # target上的bulge
+                columns.append((target[ti], None, False))
+                ti += 1
+            elif qi > 0 and isPair(target[ti], trf[qi-1]) and rng.random() < 0.5:
+                # tRF上的bulge
+                columns.append((None, trf[qi], False))
+                qi -= 1
+            else:
+                columns.append((target[ti], trf[qi], False))
+                ti += 1
+                qi -= 1
+        while not columns[-1][2]:
+            columns.pop()
+        if sum(paired for _, _, paired in columns) >= MIN_PAIRS:
+            return columns, t_start, q_end
+
+
+def trimSite(rng, columns, t_start, q_end):
+    '''去掉helix两端的若干列，得到位置相近（起止位置相差不超过3个bases）的重复entry，剩余的配对不变
+    '''
+    lead = rng.randint(0, 3)
+    tail = len(columns) - rng.randint(0, 3)
+    # 两端都需要是配对的列
+    while lead < tail and not columns[lead][2]:
+        lead += 1
+    while tail > lead and not columns[tail-1][2]:
+        tail -= 1
+    if lead >= tail:
+        return columns, t_start, q_end
+    t_skip, q_skip = siteSpan(columns[:lead])
+    return columns[lead:tail], t_start+t_skip, q_end-q_skip
+
+
+def siteSpan(columns):
+    '''helix在target和tRF上的长度
+    '''
+    return sum(t is not None for t, _, _ in columns), sum(q is not None for _, q, _ in columns)
+
+
+def toDotBracket(columns):
+    '''返回IntaRNA格式的subseqDP和hybridDP（target&tRF，都为5'->3'方向）
+    与parseDemo对RNAhybrid示意图的解析结果一致
+    '''
+    t_seq = ''.join(t for t, _, _ in columns if t is not None)
+    t_note = ''.join('(' if paired else '.' for t, _, paired in columns if t is not None)
+    q_seq = ''.join(q for _, q, _ in columns if q is not None)[::-1]
+    q_note = ''.join(')' if paired else '.' for _, q, paired in columns if q is not None)[::-1]
+    return t_seq + '&' + q_seq, t_note + '&' + q_note
+
+
+def toBlock(columns, target, t_start, trf, q_end, tran_id, trf_id, mfe, p_val):
+    '''返回RNAhybrid原始输出中的一个block（末尾带分隔符），示意图中tRF完整显示，target两端各显示1个flanking base
+    position为helix在target上的起点（以1为起点）
+    '''
+    t_span, q_span = siteSpan(columns)
+    # tRF 3'端未配对的bases，最后一个与target上游的flanking base同列
+    left = [(None, trf[qi], False) for qi in range(len(trf)-1, q_end, -1)]
+    if t_start > 0:
+        if left:
+            left[-1] = (target[t_start-1], left[-1][1], False)
+        else:
+            left.append((target[t_start-1], None, False))
+    # tRF 5'端未配对的bases，第一个与target下游的flanking base同列
+    q_next = q_end - q_span
+    right = [(None, trf[qi], False) for qi in range(q_next, -1, -1)]
+    if t_start + t_span < len(target):
+        if right:
+            right[0] = (target[t_start+t_span], right[0][1], False)
+        else:
+            right.append((target[t_start+t_span], None, False))
+    rows = [[], [], [], []]
+    for t_base, q_base, paired in left + columns + right:
+        rows[0].append(' ' if paired or t_base is None else t_base)
+        rows[1].append(t_base if paired else ' ')
+        rows[2].append(q_base if paired else ' ')
+        rows[3].append(' ' if paired or q_base is None else q_base)
+    rows = [''.join(row) for row in rows]
+    return ('target: {}\nlength: {:d}\nmiRNA : {}\nlength: {:d}\n\n'
+            'mfe: {:.1f} kcal/mol\np-value: {:.6f}\n\n'
+            'position  {:d}\n'
+            "target 5' {} 3'\n          {}   \n          {}   \nmiRNA  3' {} 5'\n\n\n").format(
+                    tran_id, len(target), trf_id, len(trf), mfe, p_val, t_start+1, *rows)
+
+
+def makeSynthetic(directory, n_hits, n_trfs=20, hits_per_pair=3, dup_rate=0.3, overlap_rate=0.3, seed=0):
+    '''在directory中生成n_hits个RNAhybrid interactions，以及相应的IntaRNA interactions
+    每个tRF和transcript组合有hits_per_pair个RNAhybrid interactions，transcript数目由n_hits决定
+    dup_rate为重复entries（同一helix去掉两端的若干列）的比例
+    overlap_rate为IntaRNA与RNAhybrid位置相同（consensus）的比例，其余IntaRNA interactions独立生成
+    相同的参数生成完全相同的数据；已生成的数据直接使用
+    返回参数dict
+    '''
+    params = {'n_hits': int(n_hits), 'n_trfs': n_trfs, 'hits_per_pair': hits_per_pair,
+              'dup_rate': dup_rate, 'overlap_rate': overlap_rate, 'seed': seed}
+    params_file = os.path.join(directory, PARAMS_FILE)
+    if os.path.isfile(params_file):
+        with open(params_file, 'rt') as f:
+            old_params = json.load(f)
+        if all(old_params.get(k) == v for k, v in params.items()):
+            print('Use synthetic data in directory "{}"'.format(directory))
+            return old_params
+
+    rng = random.Random(seed)
+    n_targets = max(1, ceil(n_hits / (n_trfs * hits_per_pair)))
+    trfs = [('tRF-SYN{:04d}'.format(i), randomSeq(rng, rng.randint(18, 40))) for i in range(n_trfs)]
+    targets = [('SYNT{:07d}'.format(i), randomSeq(rng, rng.randint(500, 5000))) for i in range(n_targets)]
+    os.makedirs(os.path.join(directory, 'rnahybrid'), exist_ok=True)
+    writeFasta(os.path.join(directory, 'trfs.fasta'), trfs)
+    writeFasta(os.path.join(directory, 'targets.fasta'), targets)
+
+    n_written = 0
+    n_intarna = 0
+    with open(os.path.join(directory, 'intarna_results.csv'), 'wt') as inta_f, \
+            open(os.path.join(directory, 'rnahybrid_sites.csv'), 'wt') as site_f:
+        inta_f.write(INTARNA_HEADER + '\n')
+        site_f.write('tRF_ID,Transcript_ID,Start_Target,End_Target,MFE\n')
+        for i, (trf_id, trf_dna) in enumerate(trfs):
+            trf = trf_dna.replace('T', 'U')
+            with open(os.path.join(directory, 'rnahybrid', 'tRF_{:d}.txt'.format(i)), 'wt') as rh_f:
+                for tran_id, target_dna in targets:
+                    if n_written >= n_hits * (i+1) / n_trfs:
+                        break
+                    target = target_dna.replace('T', 'U')
+                    sites = []
+                    while len(sites) < hits_per_pair:
+                        sites.append(makeSite(rng, target, trf))
+                        if len(sites) < hits_per_pair and rng.random() < dup_rate:
+                            sites.append(trimSite(rng, *sites[-1]))
+                    for columns, t_start, q_end in sites:
+                        mfe = -round(rng.uniform(15, 40), 1)
+                        rh_f.write(toBlock(columns, target, t_start, trf, q_end, tran_id, trf_id, mfe, rng.random()))
+                        site_f.write('{},{},{:d},{:d},{:.1f}\n'.format(
+                                trf_id, tran_id, t_start+1, t_start+siteSpan(columns)[0], mfe))
+                        n_written += 1
+                        if rng.random() >= overlap_rate:
+                            # IntaRNA在其它位置的interaction
+                            columns, t_start, q_end = makeSite(rng, target, trf)
+                        t_span, q_span = siteSpan(columns)
+                        subseq, hybrid = toDotBracket(columns)
+                        inta_f.write('{};{:d};{:d};{};{:d};{:d};{};{};{:.2f}\n'.format(
+                                tran_id, t_start+1, t_start+t_span, trf_id, q_end-q_span+2, q_end+1,
+                                subseq, hybrid, -rng.uniform(10, 40)))
+                        n_intarna += 1
+
+    params.update({'n_targets': n_targets, 'n_rnahybrid': n_written, 'n_intarna': n_intarna})
+    with open(params_file, 'wt') as f:
+        json.dump(params, f, indent=2)
+    print('{:,} RNAhybrid and {:,} IntaRNA synthetic interactions of {:d} tRFs and {:,} transcripts saved in directory "{}"'.format(
+            n_written, n_intarna, n_trfs, n_targets, directory))
+    return params
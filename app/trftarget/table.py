@@ -0,0 +1,241 @@
+# -*- coding: utf-8 -*-
+'''
+结果表格的读写，支持CSV和Parquet两种格式，根据文件扩展名区分
+Parquet格式需要pyarrow，没有安装时只能使用CSV格式
+Parquet文件中tRF_ID，Transcript_ID和Tool保存为dictionary (categorical)，坐标保存为整数，按row group压缩保存
+读入后dictionary columns转换回字符串，与读入CSV文件的结果一致
+'''
+
+
+import os
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+
+# 支持的格式及对应的扩展名
+FORMATS = {'csv': '.csv', 'parquet': '.parquet'}
+
+# 保存为dictionary的columns
+CATEGORY_COLS = ['tRF_ID', 'Transcript_ID', 'Tool']
+
+# 保存为整数的columns
+INT_COLS = ['Max_Hit_Len', 'Start_tRF', 'End_tRF', 'Start_Target', 'End_Target', 'Consensus']
+
+# 保存为浮点数的columns
+FLOAT_COLS = ['MFE']
+
+# 每个row group的rows数目
+ROW_GROUP_SIZE = 100000
+
+
+def checkFormat(file_format):
+    '''确认格式有效，并且Parquet格式所需的pyarrow已安装
+    '''
+    if file_format not in FORMATS:
+        raise Exception('Invalid file format "{}"! Supported formats: {}'.format(file_format, ', '.join(FORMATS)))
+    if file_format == 'parquet' and pa is None:
+        raise Exception('pyarrow is needed for parquet format, please install it by `pip install pyarrow`!')
+
+
+def getTableFile(directory, name, file_format='csv'):
+    '''directory中名为name的表格文件，扩展名由格式决定
+    '''
+    return os.path.join(directory, name + FORMATS[file_format])
+
+
+def findTable(directory, name):
+    '''查找directory中名为name的表格文件，CSV和Parquet格式均可
+    两种格式都存在时，使用较新的文件
+    '''
+    files = [getTableFile(directory, name, one_format) for one_format in FORMATS]
+    files = [one_file for one_file in files if os.path.isfile(one_file)]
+    if len(files) == 0:
+        raise Exception('File "{}" not found in directory "{}"!'.format(name, directory))
+    return max(files, key=os.path.getmtime)
+
+
+def isParquet(file_name):
+    return file_name.endswith(FORMATS['parquet'])
+
+
+def toArrow(dataframe, columns=None):
+    '''dataframe转换为arrow table，使用固定的column类型，保证各部分的schema一致
+    '''
+    if columns is not None:
+        dataframe = dataframe.reindex(columns=columns)
+    table = pa.Table.from_pandas(dataframe, preserve_index=False)
+    fields = []
+    for field in table.schema:
+        if field.name in CATEGORY_COLS:
+            fields.append(pa.field(field.name, pa.dictionary(pa.int32(), pa.string())))
+        elif field.name in INT_COLS:
+            fields.append(pa.field(field.name, pa.int64()))
+        elif field.name in FLOAT_COLS:
+            fields.append(pa.field(field.name, pa.float64()))
+        elif pa.types.is_null(field.type):
+            # 全部为空的column（例如空的dataframe）
+            fields.append(pa.field(field.name, pa.string()))
+        else:
+            fields.append(field)
+    return table.cast(pa.schema(fields))
+
+
+def fromArrow(table):
+    '''arrow table转换为dataframe，dictionary columns转换回字符串
+    '''
+    dataframe = table.to_pandas()
+    for name in CATEGORY_COLS:
+        if name in dataframe.columns:
+            dataframe[name] = dataframe[name].astype(object)
+    return dataframe
+
+
+def readTable(file_name, dtype=None):
+    '''读入整个表格文件，dtype只用于CSV文件
+    '''
+    if isParquet(file_name):
+        checkFormat('parquet')
+        return fromArrow(pq.read_table(file_name))
+    return pd.read_csv(file_name, dtype=dtype)
+
+
+def iterTable(file_name, chunksize, dtype=None):
+    '''分块读入表格文件，各块的index连续，与整体读入时一致
+    '''
+    if isParquet(file_name):
+        checkFormat('parquet')
+        start = 0
+        for batch in pq.ParquetFile(file_name).iter_batches(batch_size=chunksize):
+            chunk = fromArrow(pa.Table.from_batches([batch]))
+            chunk.index = pd.RangeIndex(start, start+chunk.shape[0])
+            start += chunk.shape[0]
+            yield chunk
+    else:
+        yield from pd.read_csv(file_name, dtype=dtype, chunksize=chunksize)
+
+
+def readColumns(file_name):
+    '''只读入表格文件的列名
+    '''
+    if isParquet(file_name):
+        checkFormat('parquet')
+        return pq.read_schema(file_name).names
+    return list(pd.read_csv(file_name, nrows=0).columns)
+
+
+def setColumn(file_name, name, values):
+    '''将Parquet文件的name column设为values（in place），没有该column时加在最后
+    逐个row group处理，先写入临时文件再替换
+    '''
+    checkFormat('parquet')
+    parquet_file = pq.ParquetFile(file_name)
+    if parquet_file.metadata.num_rows != values.shape[0]:
+        raise Exception('{:d} values do not match the {:d} entries in "{}"!'.format(
+                values.shape[0], parquet_file.metadata.num_rows, file_name))
+    tmp_file = file_name + '.tmp'
+    
+    def setOne(table, column):
+        if name in table.column_names:
+            return table.set_column(table.column_names.index(name), name, column)
+        return table.append_column(name, column)
+    
+    schema = setOne(parquet_file.schema_arrow.empty_table(), pa.array(values[:0])).schema
+    row = 0
+    with pq.ParquetWriter(tmp_file, schema, compression='zstd') as writer:
+        for i in range(parquet_file.num_row_groups):
+            table = parquet_file.read_row_group(i)
+            writer.write_table(setOne(table, pa.array(values[row:row+table.num_rows])))
+            row += table.num_rows
+    parquet_file.close()
+    os.replace(tmp_file, file_name)
+
+
+def writeTable(dataframe, file_name, columns=None):
+    '''保存整个dataframe
+    '''
+    if isParquet(file_name):
+        checkFormat('parquet')
+        pq.write_table(toArrow(dataframe, columns), file_name, row_group_size=ROW_GROUP_SIZE, compression='zstd')
+    else:
+        dataframe.to_csv(file_name, columns=columns, index=False)
+
+
+def encodeTable(dataframe, columns, file_format):
+    '''将dataframe的一部分转换为可以追加写入的形式：CSV为不含header的字符串，Parquet为arrow table
+    可以在子进程中完成转换，结果传回主进程写入
+    '''
+    if file_format == 'parquet':
+        return toArrow(dataframe, columns)
+    return dataframe.to_csv(None, header=False, columns=columns, index=False)
+
+
+class TableWriter:
+    '''逐块写入表格文件
+    CSV格式先写入header，之后逐块追加
+    Parquet格式先缓存各块，累计达到ROW_GROUP_SIZE个rows时写成row group，剩余的rows在close时写入
+    因此每块很小时（例如RNAhybrid结果每个tRF一块），row group的大小仍为ROW_GROUP_SIZE
+    '''
+
+    def __init__(self, file_name, columns):
+        self.file_name = file_name
+        self.columns = list(columns)
+        self.parquet = isParquet(file_name)
+        self.writer = None
+        # 尚未写入的arrow tables及其rows数目
+        self.buffer = []
+        self.buffered = 0
+        if self.parquet:
+            checkFormat('parquet')
+        else:
+            self.writer = open(file_name, 'w', newline='')
+            pd.DataFrame(columns=self.columns).to_csv(self.writer, index=False)
+
+    def write(self, data):
+        '''追加一部分数据，data为dataframe，或encodeTable的结果
+        '''
+        if isinstance(data, pd.DataFrame):
+            data = encodeTable(data, self.columns, 'parquet' if self.parquet else 'csv')
+        if not self.parquet:
+            self.writer.write(data)
+            return
+        if data.num_rows == 0:
+            return
+        self.buffer.append(data)
+        self.buffered += data.num_rows
+        if self.buffered >= ROW_GROUP_SIZE:
+            self.flush()
+
+    def flush(self, final=False):
+        '''将缓存中完整的row groups写入文件，final为True时全部写入
+        '''
+        if self.buffered == 0:
+            return
+        table = pa.concat_tables(self.buffer)
+        n_rows = self.buffered if final else self.buffered // ROW_GROUP_SIZE * ROW_GROUP_SIZE
+        if self.writer is None:
+            self.writer = pq.ParquetWriter(self.file_name, table.schema, compression='zstd')
+        self.writer.write_table(table.slice(0, n_rows), row_group_size=ROW_GROUP_SIZE)
+        rest = table.slice(n_rows)
+        self.buffer = [rest] if rest.num_rows > 0 else []
+        self.buffered = rest.num_rows
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        if self.parquet:
+            self.flush(final=True)
+        if self.writer is None:
+            # 没有任何数据，只保存schema
+            pq.write_table(toArrow(pd.DataFrame(columns=self.columns)), self.file_name)
+        else:
+            self.writer.close()
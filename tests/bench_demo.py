@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+'''
+getDemo和getHits的micro-benchmark，与改写前的getDemo，getMaxHitLen和getMaxHitDP比较
+使用trftarget.synthetic生成的IntaRNA结果，无需IntaRNA程序
+用法：python tests/bench_demo.py [interactions数目，默认为20000]
+'''
+
+
+import os
+import sys
+import tempfile
+from time import perf_counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app'))
+
+import pandas as pd
+from trftarget.demo import getDemo, getHits
+from trftarget.intarna import readFasta
+from trftarget.synthetic import makeSynthetic
+import legacy
+
+
+def timeIt(func, entries):
+    '''对每个entry调用func，返回每次调用的平均耗时（us）
+    '''
+    start = perf_counter()
+    for entry in entries:
+        func(*entry)
+    return 1e6 * (perf_counter() - start) / len(entries)
+
+
+def legacyHits(*args):
+    demo = legacy.getDemo(*args)
+    max_len = legacy.getMaxHitLen(demo)
+    return max_len, legacy.getMaxHitDP(demo, max_len)
+
+
+def main(n_hits):
+    with tempfile.TemporaryDirectory() as data_dir:
+        makeSynthetic(data_dir, n_hits, n_trfs=5)
+        tran_seq = {k: v.replace('T', 'U') for k, v in readFasta(os.path.join(data_dir, 'targets.fasta'))}
+        trf_seq = {k: v.replace('T', 'U') for k, v in readFasta(os.path.join(data_dir, 'trfs.fasta'))}
+        data = pd.read_csv(os.path.join(data_dir, 'intarna_results.csv'), sep=';', dtype={'id1': str, 'id2': str})
+    entries = [(tran_seq[tran_id], start1, end1, trf_seq[trf_id], start2, end2, subseq, hybrid)
+               for tran_id, start1, end1, trf_id, start2, end2, subseq, hybrid
+               in zip(data['id1'], data['start1'], data['end1'], data['id2'],
+                      data['start2'], data['end2'], data['subseqDP'], data['hybridDP'])]
+
+    results = [('getDemo', timeIt(legacy.getDemo, entries), timeIt(getDemo, entries)),
+               ('Max_Hit_Len and Max_Hit_DP', timeIt(legacyHits, entries),
+                timeIt(lambda *args: getHits(args[-2], args[-1]), entries))]
+    print('----------------------------------')
+    print('{:,} synthetic IntaRNA interactions'.format(len(entries)))
+    for name, old, new in results:
+        print('{}: legacy {:.1f} us, new {:.1f} us per interaction, {:.1f}x faster'.format(name, old, new, old/new))
+
+
+if __name__ == '__main__':
+    main(int(float(sys.argv[1])) if len(sys.argv) > 1 else 20000)
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+'''
+测试共用的fixtures
+trftarget包位于app文件夹中，与Docker image中的/app一致
+'''
+
+
+import os
+import sys
+import subprocess
+import pytest
+
+APP_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app')
+SAMPLE_DIR = os.path.join(os.path.dirname(APP_DIR), 'sample_data')
+sys.path.insert(0, APP_DIR)
+
+import pandas as pd
+from trftarget.intarna import readFasta
+from trftarget.rnahybrid import RNAHYBRID, parseResult, getStartEnd
+from trftarget.synthetic import makeSynthetic
+
+# Docker image中的RNAhybrid，或者repo中附带的RNAhybrid（linux/amd64，需要有执行权限）
+RNAHYBRID_PATHS = [RNAHYBRID, os.path.join(APP_DIR, 'RNAhybrid')]
+
+
+def readSeqs(file_name):
+    return {k: v.replace('T', 'U') for k, v in readFasta(file_name)}
+
+
+@pytest.fixture(scope='session')
+def sample_rnahybrid():
+    '''对sample_data中的tRFs和transcripts运行RNAhybrid（-b 3，保留suboptimal的重复entries）
+    返回解析结果（包括target和tRF上的起止坐标），以及transcript和tRF序列
+    '''
+    rnahybrid = next((one for one in RNAHYBRID_PATHS if os.access(one, os.X_OK)), None)
+    if rnahybrid is None:
+        pytest.skip('RNAhybrid is not available')
+    target_file = os.path.join(SAMPLE_DIR, 'test_transcript.fasta')
+    query_file = os.path.join(SAMPLE_DIR, 'test_tRF.fasta')
+    try:
+        with subprocess.Popen([rnahybrid, '-t', target_file, '-q', query_file, '-b', '3', '-e', '-15',
+                               '-m', '150000', '-n', '70', '-s', '3utr_human'],
+                              stdout=subprocess.PIPE, encoding='utf-8') as proc:
+            data, _ = parseResult(proc.stdout)
+    except OSError:
+        pytest.skip('RNAhybrid can not be executed on this platform')
+    assert proc.returncode == 0
+    tran_seq = readSeqs(target_file)
+    trf_seq = readSeqs(query_file)
+    starts = [getStartEnd(tran_seq[tran_id], subseq.split('&')[0], pos)
+              for tran_id, subseq, pos in zip(data['Transcript_ID'], data['subseqDP'], data['Pos'])]
+    data['Start_Target'], data['End_Target'] = zip(*starts)
+    ends = [getStartEnd(trf_seq[trf_id], subseq.split('&')[1]) for trf_id, subseq in zip(data['tRF_ID'], data['subseqDP'])]
+    data['Start_tRF'], data['End_tRF'] = zip(*ends)
+    return data, tran_seq, trf_seq
+
+
+@pytest.fixture(scope='session')
+def synthetic_data(tmp_path_factory):
+    '''trftarget.synthetic生成的RNAhybrid和IntaRNA结果
+    返回数据文件夹，IntaRNA结果，以及transcript和tRF序列
+    '''
+    data_dir = str(tmp_path_factory.mktemp('synthetic'))
+    makeSynthetic(data_dir, 3000, n_trfs=5, hits_per_pair=3, dup_rate=0.5, seed=1)
+    intarna = pd.read_csv(os.path.join(data_dir, 'intarna_results.csv'), sep=';', dtype={'id1': str, 'id2': str})
+    return (data_dir, intarna, readSeqs(os.path.join(data_dir, 'targets.fasta')),
+            readSeqs(os.path.join(data_dir, 'trfs.fasta')))
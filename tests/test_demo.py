@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+'''
+golden-output测试：trftarget.demo生成的示意图（Demo），以及从dot-bracket notation得到的Max_Hit_Len和Max_Hit_DP
+与改写前的getDemo，getMaxHitLen和getMaxHitDP的结果完全一致
+'''
+
+
+import os
+import pandas as pd
+from trftarget.demo import getDemo, getHits
+from trftarget.intarna import inta_analysis
+from trftarget.table import readTable
+import legacy
+
+
+def legacyHits(demo):
+    max_len = legacy.getMaxHitLen(demo)
+    return max_len, legacy.getMaxHitDP(demo, max_len)
+
+
+def checkEntries(entries, tran_seq, trf_seq):
+    '''entries为(Transcript_ID, Start_Target, End_Target, tRF_ID, Start_tRF, End_tRF, subseqDP, hybridDP)
+    返回检查的entries数目
+    '''
+    n = 0
+    for tran_id, start1, end1, trf_id, start2, end2, subseq, hybrid in entries:
+        args = (tran_seq[tran_id], int(start1), int(end1), trf_seq[trf_id], int(start2), int(end2), subseq, hybrid)
+        demo = legacy.getDemo(*args)
+        assert getDemo(*args) == demo
+        assert getHits(subseq, hybrid) == legacyHits(demo)
+        n += 1
+    return n
+
+
+def test_sample_rnahybrid(sample_rnahybrid):
+    '''sample_data的RNAhybrid结果，解析时得到的Max_Hit_Len和Max_Hit_DP也与原实现一致
+    '''
+    data, tran_seq, trf_seq = sample_rnahybrid
+    assert checkEntries(zip(data['Transcript_ID'], data['Start_Target'], data['End_Target'], data['tRF_ID'],
+                            data['Start_tRF'], data['End_tRF'], data['subseqDP'], data['hybridDP']),
+                        tran_seq, trf_seq) > 0
+    for i in data.index:
+        demo = legacy.getDemo(tran_seq[data.at[i, 'Transcript_ID']], data.at[i, 'Start_Target'], data.at[i, 'End_Target'],
+                              trf_seq[data.at[i, 'tRF_ID']], data.at[i, 'Start_tRF'], data.at[i, 'End_tRF'],
+                              data.at[i, 'subseqDP'], data.at[i, 'hybridDP'])
+        assert (data.at[i, 'Max_Hit_Len'], data.at[i, 'Max_Hit_DP']) == legacyHits(demo)
+
+
+def test_synthetic_intarna(synthetic_data):
+    _, intarna, tran_seq, trf_seq = synthetic_data
+    assert checkEntries(zip(intarna['id1'], intarna['start1'], intarna['end1'], intarna['id2'],
+                            intarna['start2'], intarna['end2'], intarna['subseqDP'], intarna['hybridDP']),
+                        tran_seq, trf_seq) == intarna.shape[0]
+
+
+def test_parsed_intarna(synthetic_data, tmp_path):
+    '''inta_analysis解析synthetic IntaRNA结果，输出的Demo，Max_Hit_Len和Max_Hit_DP与原实现一致
+    '''
+    data_dir, intarna, tran_seq, trf_seq = synthetic_data
+    intarna.to_csv(tmp_path / 'intarna_results.csv', sep=';', index=False)
+    pd.DataFrame({'tRF_ID': list(trf_seq), 'tRF_Seq': list(trf_seq.values()),
+                  'tRF_Length': [len(seq) for seq in trf_seq.values()]}).to_csv(tmp_path / 'trfs_info.csv', index=False)
+    pd.DataFrame({'Trans_ID': list(tran_seq), 'Trans_Seq': list(tran_seq.values()),
+                  'Trans_Length': [len(seq) for seq in tran_seq.values()]}).to_csv(tmp_path / 'transcripts_info.csv', index=False)
+    inta_analysis(str(tmp_path))
+
+    parsed = readTable(os.path.join(str(tmp_path), 'parsed_intarna_results.csv'), dtype={'tRF_ID': str, 'Transcript_ID': str})
+    assert parsed.shape[0] > 0
+    for i in parsed.index:
+        demo = legacy.getDemo(tran_seq[parsed.at[i, 'Transcript_ID']], parsed.at[i, 'Start_Target'], parsed.at[i, 'End_Target'],
+                              trf_seq[parsed.at[i, 'tRF_ID']], parsed.at[i, 'Start_tRF'], parsed.at[i, 'End_tRF'],
+                              parsed.at[i, 'SubseqDP'], parsed.at[i, 'HybridDP'])
+        assert parsed.at[i, 'Demo'] == demo
+        assert (parsed.at[i, 'Max_Hit_Len'], parsed.at[i, 'Max_Hit_DP']) == legacyHits(demo)
+
+
+def test_equal_hits():
+    '''两段长度相同，匹配符号也相同的连续匹配
+    原getMaxHitDP按匹配符号查找位置，两段都返回第一段的序列，getHits保留这一行为
+    '''
+    full_seq1 = 'AAGGGACCCAA'
+    full_seq2 = 'GGGUCCC'
+    subseq = 'GGGACCC&GGGUCCC'
+    hybrid = '(((.(((&))).)))'
+    demo = legacy.getDemo(full_seq1, 3, 9, full_seq2, 1, 7, subseq, hybrid)
+    assert getDemo(full_seq1, 3, 9, full_seq2, 1, 7, subseq, hybrid) == demo
+    assert getHits(subseq, hybrid) == legacyHits(demo) == (3, 'GGG&CCC|GGG&CCC')
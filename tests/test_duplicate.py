@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+'''
+checkDuplicate（向量化的interval sweep）与改写前逐对比较的实现，对相同输入返回相同的重复entries
+'''
+
+
+import itertools
+import numpy as np
+import pandas as pd
+import pytest
+from trftarget.duplicate import checkDuplicate
+import legacy
+
+
+def legacyDuplicate(dataframe):
+    '''原实现只按Transcript_ID分组，调用时每次只包含1个tRF（RNAhybrid结果按tRF合并）
+    因此逐个tRF调用，与checkDuplicate按(tRF, transcript)分组的定义一致
+    '''
+    to_del = []
+    trf_ids = dataframe['tRF_ID'].to_numpy()
+    bounds = np.flatnonzero(np.concatenate(([True], trf_ids[1:] != trf_ids[:-1], [True])))
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        to_del += legacy.checkDuplicate(dataframe.iloc[start:end])
+    return to_del
+
+
+def randomEntries(rng, n, n_trfs=2, n_trans=3, max_start=60):
+    '''随机的interactions，起点范围小，存在大量重叠，起点和MFE都有相同值，index不连续
+    '''
+    data = pd.DataFrame({'tRF_ID': rng.choice(['tRF-{:d}'.format(i) for i in range(n_trfs)], n),
+                         'Transcript_ID': rng.choice(['ENST{:d}'.format(i) for i in range(n_trans)], n),
+                         'MFE': rng.integers(-30, -15, n).astype(float),
+                         'Start_Target': rng.integers(1, max_start, n)})
+    data['End_Target'] = data['Start_Target'] + rng.integers(8, 25, n)
+    data.index = rng.permutation(n) * 3 + 7
+    return data.sort_values(['tRF_ID', 'Transcript_ID', 'MFE'], kind='mergesort')
+
+
+def test_sample_rnahybrid(sample_rnahybrid):
+    '''sample_data的RNAhybrid结果，按combineResult的方式逐个tRF排序
+    RNAhybrid的suboptimal结果在sample_data中没有重复，重复entries由下面的synthetic和随机数据覆盖
+    '''
+    data = sample_rnahybrid[0]
+    for _, one_trf in data.groupby('tRF_ID', sort=False):
+        one_trf = one_trf.sort_values(['Transcript_ID', 'MFE', 'Max_Hit_Len'], ascending=[True, True, False])
+        assert checkDuplicate(one_trf) == legacy.checkDuplicate(one_trf)
+
+
+def test_synthetic(synthetic_data):
+    '''synthetic的RNAhybrid和IntaRNA结果，按IntaRNA结果解析的方式排序
+    '''
+    data_dir, intarna, _, _ = synthetic_data
+    sites = pd.read_csv(data_dir + '/rnahybrid_sites.csv', dtype={'tRF_ID': str, 'Transcript_ID': str})
+    intarna = intarna.rename(columns={'id1': 'Transcript_ID', 'id2': 'tRF_ID', 'E': 'MFE',
+                                      'start1': 'Start_Target', 'end1': 'End_Target'})
+    for data in (sites, intarna):
+        data = data.sort_values(['tRF_ID', 'Transcript_ID', 'MFE'], kind='mergesort')
+        expected = legacyDuplicate(data)
+        assert len(expected) > 0
+        assert checkDuplicate(data) == expected
+
+
+@pytest.mark.parametrize('seed', range(50))
+def test_random_overlaps(seed):
+    rng = np.random.default_rng(seed)
+    data = randomEntries(rng, int(rng.integers(1, 300)))
+    assert checkDuplicate(data) == legacyDuplicate(data)
+
+
+def test_tied_starts():
+    '''起点全部相同，只有终点和MFE不同
+    '''
+    rng = np.random.default_rng(0)
+    data = randomEntries(rng, 200, n_trfs=1, n_trans=1, max_start=2)
+    assert checkDuplicate(data) == legacyDuplicate(data)
+
+
+@pytest.mark.parametrize('diff_start,diff_end', list(itertools.product([-9, -8, -6, -5, 0, 5, 6, 8, 9], repeat=2)))
+def test_boundaries(diff_start, diff_end):
+    '''起止位置相差5和8个bases的边界，第2条记录MFE较高
+    '''
+    data = pd.DataFrame({'tRF_ID': ['tRF-1', 'tRF-1'], 'Transcript_ID': ['ENST1', 'ENST1'], 'MFE': [-30.0, -20.0],
+                         'Start_Target': [100, 100+diff_start], 'End_Target': [130, 130+diff_end]}, index=[4, 2])
+    diff_start, diff_end = abs(diff_start), abs(diff_end)
+    is_dup = (diff_start <= 8 and diff_end <= 5) or (diff_start <= 5 and diff_end <= 8)
+    assert checkDuplicate(data) == legacyDuplicate(data) == ([2] if is_dup else [])
+
+
+def test_groups_not_mixed():
+    '''相同位置的记录，tRF或transcript不同时不属于重复
+    '''
+    data = pd.DataFrame({'tRF_ID': ['tRF-1', 'tRF-1', 'tRF-2', 'tRF-2'],
+                         'Transcript_ID': ['ENST1', 'ENST2', 'ENST2', 'ENST2'], 'MFE': [-30.0, -20.0, -25.0, -20.0],
+                         'Start_Target': [100, 100, 100, 101], 'End_Target': [130, 130, 130, 131]})
+    assert checkDuplicate(data) == legacyDuplicate(data) == [3]
+    assert checkDuplicate(data.iloc[:0]) == []
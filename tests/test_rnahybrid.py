@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+'''
+rna_work逐行解析RNAhybrid的输出，RNAhybrid异常退出时报告其exit status，而不是解析不完整的输出
+用python代替RNAhybrid，打印固定的输出后以给定的exit status退出
+'''
+
+
+import sys
+from subprocess import CalledProcessError
+import pytest
+from trftarget.rnahybrid import rna_work
+
+# RNAhybrid 2.1.2的一个匹配结果block，示意图的4行长度相同（行尾有空格）
+BLOCK = '\n'.join(['target: t1', 'length: 47', 'miRNA : command_line', 'length: 17', '',
+                   'mfe: -33.5 kcal/mol', 'p-value: 0.000002', '',
+                   'position  31',
+                   "target 5' A                  3'",
+                   '           UCGAUCGGAUCGAUCG    ',
+                   '           AGCUAGCCUAGCUAGC    ',
+                   "miRNA  3'                  G 5'", '', '', ''])
+
+
+def fakeJob(output, status):
+    '''打印output后以status退出的job
+    '''
+    script = 'import sys; sys.stdout.write({!r}); sys.stdout.flush(); sys.exit({:d})'.format(output, status)
+    return ('tRF-1', 'tRF-1', [sys.executable, '-c', script])
+
+
+def test_success():
+    record, data = rna_work(fakeJob(BLOCK * 2, 0))
+    assert data.shape[0] == 2
+    assert (data['tRF_ID'] == 'tRF-1').all()
+    assert record['Entries_Kept'] == 2
+
+
+def test_exit_after_block():
+    '''输出1个完整的block后退出，已解析的部分结果不能作为job的结果
+    '''
+    with pytest.raises(CalledProcessError) as err:
+        rna_work(fakeJob(BLOCK, 1))
+    assert err.value.returncode == 1
+
+
+def test_exit_in_block():
+    '''最后一个block不完整，解析出错时报告RNAhybrid的exit status
+    '''
+    with pytest.raises(CalledProcessError) as err:
+        rna_work(fakeJob(BLOCK + BLOCK[:60], 1))
+    assert err.value.returncode == 1
+    assert err.value.__cause__ is not None
+
+
+def test_parse_error():
+    '''RNAhybrid正常结束时，解析错误照常报出
+    '''
+    with pytest.raises(IndexError):
+        rna_work(fakeJob(BLOCK + BLOCK[:60], 0))